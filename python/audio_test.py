@@ -6,32 +6,241 @@ Tests basic audio processing capabilities:
 - Transcription
 - Description
 - Analysis
+
+Usage:
+  python audio_test.py <audio_file>
+  python audio_test.py --batch DIR_OR_MANIFEST [--out results.jsonl] [--workers N]
+
+Batch mode runs the three analyses concurrently for each file, with at
+most --workers files in flight. A manifest is a text file with one audio
+path per line (relative to the manifest; blank lines and # comments are
+skipped). Each finished file is appended to the --out JSONL file. A
+rerun skips files already there with the same content hash, so an
+interrupted batch continues where it stopped. Upload handles are cached
+by content hash in --upload-cache, so a file is only uploaded again once
+its handle is close to expiry or the content changes.
+
+--endpoint points uploads and analyses at another API base URL (for
+example a local stand-in); GOOGLE_GEMINI_BASE_URL works as well.
 """
 
+import argparse
+import asyncio
+import hashlib
+import json
 import sys
 import os
+import time
 from pathlib import Path
 
 from google import genai
+from google.genai import types
 
-def main():
-    # Check for API key
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        print("Error: GOOGLE_API_KEY environment variable not set")
-        print("Get your key at: https://aistudio.google.com/apikey")
+MODEL = "gemini-2.5-flash"
+
+ANALYSES = (
+    ("transcription", "Transcription",
+     "Transcribe this audio. Provide the full text."),
+    ("description", "Audio Description",
+     "Describe this audio clip. What do you hear? Include details about speakers, tone, background sounds, etc."),
+    ("analysis", "Content Analysis",
+     "Analyze this audio content. Summarize the main topics, identify any speakers, and note the overall sentiment."),
+)
+
+AUDIO_SUFFIXES = ('.wav', '.mp3', '.aiff', '.aac', '.ogg', '.flac')
+
+# Uploaded files expire after 48 hours; re-upload when less than this is left
+UPLOAD_MARGIN = 3600
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gemini audio understanding test")
+    parser.add_argument('audio_file', nargs='?', help='single audio file to analyze')
+    parser.add_argument('--batch', metavar='SOURCE', help='directory or manifest of audio files')
+    parser.add_argument('--out', default='audio_results.jsonl', help='batch results (JSONL, appended)')
+    parser.add_argument('--workers', type=int, default=4, help='files analyzed at once in batch mode')
+    parser.add_argument('--upload-cache', help='upload handle cache (default: next to --out)')
+    parser.add_argument('--endpoint', help='API base URL (default: Gemini API)')
+    return parser.parse_args()
+
+
+def batch_inputs(source):
+    """Audio files from a directory (recursively) or a manifest."""
+    source = Path(source)
+    if source.is_dir():
+        return sorted(p for p in source.rglob('*') if p.suffix.lower() in AUDIO_SUFFIXES)
+    paths = []
+    for line in source.read_text().splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            path = Path(line)
+            paths.append(path if path.is_absolute() else source.parent / path)
+    return paths
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class UploadCache:
+    """Uploaded file handles by content hash, persisted as JSON.
+
+    Concurrent requests for the same content share one upload.
+    """
+
+    def __init__(self, path, client, endpoint):
+        self.path = Path(path)
+        self.client = client
+        # The client falls back to GOOGLE_GEMINI_BASE_URL without --endpoint
+        self.endpoint = endpoint or os.environ.get('GOOGLE_GEMINI_BASE_URL') or ''
+        self._entries = {}
+        if self.path.exists():
+            try:
+                self._entries = json.loads(self.path.read_text())
+            except ValueError:
+                print(f"Ignoring unreadable upload cache {self.path}")
+        self._pending = {}  # digest -> upload task
+        self.hits = 0
+        self.uploads = 0
+
+    def _key(self, digest):
+        # Handles are only valid on the endpoint that issued them
+        return f"{self.endpoint} {digest}" if self.endpoint else digest
+
+    async def part(self, path, digest):
+        """(Part referencing the uploaded file, whether it came from the cache)."""
+        entry = self._entries.get(self._key(digest))
+        if entry and entry['expires'] - UPLOAD_MARGIN > time.time():
+            self.hits += 1
+            return types.Part.from_uri(file_uri=entry['uri'], mime_type=entry['mimeType']), True
+        task = self._pending.get(digest)
+        if task is None:
+            task = asyncio.ensure_future(self._upload(path, digest))
+            self._pending[digest] = task
+            task.add_done_callback(lambda _: self._pending.pop(digest, None))
+        entry = await task
+        return types.Part.from_uri(file_uri=entry['uri'], mime_type=entry['mimeType']), False
+
+    def forget(self, digest):
+        """Drop a handle the API no longer accepts."""
+        if self._entries.pop(self._key(digest), None) is not None:
+            self._save()
+
+    async def _upload(self, path, digest):
+        uploaded = await self.client.aio.files.upload(file=str(path))
+        self.uploads += 1
+        if uploaded.expiration_time:
+            expires = uploaded.expiration_time.timestamp()
+        else:
+            expires = time.time() + 48 * 3600
+        entry = {
+            'name': uploaded.name,
+            'uri': uploaded.uri,
+            'mimeType': uploaded.mime_type,
+            'expires': expires,
+        }
+        self._entries[self._key(digest)] = entry
+        self._save()
+        return entry
+
+    def _save(self):
+        now = time.time()
+        self._entries = {k: v for k, v in self._entries.items() if v['expires'] > now}
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps(self._entries, indent=1))
+        os.replace(tmp, self.path)
+
+
+def completed(out_path):
+    """(file, sha256) pairs with a successful row in the results file."""
+    done = set()
+    if not out_path.exists():
+        return done
+    with open(out_path) as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # line cut short by an interrupted run
+            if 'error' not in row:
+                done.add((row['file'], row['sha256']))
+    return done
+
+
+def open_results(out_path):
+    """Results file for appending, starting on a fresh line."""
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out = open(out_path, 'a+b')
+    if out.tell():
+        out.seek(-1, os.SEEK_END)
+        if out.read(1) != b'\n':
+            out.write(b'\n')
+    return out
+
+
+async def analyze_file(client, uploads, path, digest, limit, out):
+    """Upload (or reuse) one file and run every analysis on it concurrently."""
+    row = {'file': str(path), 'sha256': digest}
+    async with limit:
+        started = time.perf_counter()
+        cached = False
+        try:
+            part, cached = await uploads.part(path, digest)
+            responses = await asyncio.gather(*(
+                client.aio.models.generate_content(model=MODEL, contents=[prompt, part])
+                for _, _, prompt in ANALYSES
+            ))
+            for (key, _, _), response in zip(ANALYSES, responses):
+                row[key] = response.text
+        except Exception as e:
+            row['error'] = f"{type(e).__name__}: {e}"
+            if cached:
+                uploads.forget(digest)
+        row['uploadCached'] = cached
+        row['seconds'] = round(time.perf_counter() - started, 3)
+    out.write((json.dumps(row) + '\n').encode())
+    out.flush()
+    status = row.get('error') or f"done in {row['seconds']:.1f} s"
+    print(f"{path}: {status}")
+    return row
+
+
+async def run_batch(args, client):
+    paths = batch_inputs(args.batch)
+    missing = [p for p in paths if not p.exists()]
+    if missing:
+        print(f"Error: {len(missing)} file(s) not found, e.g. {missing[0]}")
         sys.exit(1)
+    out_path = Path(args.out)
+    cache_path = Path(args.upload_cache) if args.upload_cache else out_path.with_name('.upload_cache.json')
+    uploads = UploadCache(cache_path, client, args.endpoint)
 
-    # Initialize client
-    client = genai.Client(api_key=api_key)
+    digests = await asyncio.gather(*(asyncio.to_thread(file_hash, p) for p in paths))
+    done = completed(out_path)
+    todo = [(p, d) for p, d in zip(paths, digests) if (str(p), d) not in done]
+    print(f"{len(paths)} file(s), {len(paths) - len(todo)} already in {out_path}, "
+          f"{len(todo)} to analyze with {args.workers} worker(s)")
 
-    # Check for audio file argument
-    if len(sys.argv) < 2:
-        print("Usage: python audio_test.py <audio_file>")
-        print("Supported formats: WAV, MP3, AIFF, AAC, OGG, FLAC")
+    limit = asyncio.Semaphore(max(1, args.workers))
+    started = time.perf_counter()
+    with open_results(out_path) as out:
+        rows = await asyncio.gather(*(
+            analyze_file(client, uploads, p, d, limit, out) for p, d in todo
+        ))
+    failed = sum(1 for row in rows if 'error' in row)
+    print("-" * 50)
+    print(f"{len(rows) - failed} analyzed, {failed} failed in {time.perf_counter() - started:.1f} s "
+          f"({uploads.uploads} uploaded, {uploads.hits} upload cache hits)")
+    if failed:
+        print("Rerun the same command to retry the failures.")
         sys.exit(1)
 
-    audio_path = Path(sys.argv[1])
+
+def run_single(client, audio_path):
     if not audio_path.exists():
         print(f"Error: File not found: {audio_path}")
         sys.exit(1)
@@ -44,46 +253,46 @@ def main():
     uploaded_file = client.files.upload(file=str(audio_path))
     print(f"Uploaded: {uploaded_file.name}")
 
-    # Test 1: Transcription
-    print("\n[1] Transcription:")
-    print("-" * 30)
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            "Transcribe this audio. Provide the full text.",
-            uploaded_file
-        ]
-    )
-    print(response.text)
-
-    # Test 2: Description
-    print("\n[2] Audio Description:")
-    print("-" * 30)
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            "Describe this audio clip. What do you hear? Include details about speakers, tone, background sounds, etc.",
-            uploaded_file
-        ]
-    )
-    print(response.text)
-
-    # Test 3: Analysis
-    print("\n[3] Content Analysis:")
-    print("-" * 30)
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            "Analyze this audio content. Summarize the main topics, identify any speakers, and note the overall sentiment.",
-            uploaded_file
-        ]
-    )
-    print(response.text)
+    for i, (_, title, prompt) in enumerate(ANALYSES, 1):
+        print(f"\n[{i}] {title}:")
+        print("-" * 30)
+        response = client.models.generate_content(
+            model=MODEL,
+            contents=[prompt, uploaded_file]
+        )
+        print(response.text)
 
     # Cleanup
     print("\n" + "-" * 50)
     print("Done!")
 
 
+def main():
+    args = parse_args()
+
+    # Check for API key
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        print("Error: GOOGLE_API_KEY environment variable not set")
+        print("Get your key at: https://aistudio.google.com/apikey")
+        sys.exit(1)
+
+    # Check for audio file argument
+    if not args.audio_file and not args.batch:
+        print("Usage: python audio_test.py <audio_file>")
+        print("       python audio_test.py --batch DIR_OR_MANIFEST")
+        print("Supported formats: WAV, MP3, AIFF, AAC, OGG, FLAC")
+        sys.exit(1)
+
+    # Initialize client
+    http_options = types.HttpOptions(base_url=args.endpoint) if args.endpoint else None
+    client = genai.Client(api_key=api_key, http_options=http_options)
+
+    if args.batch:
+        asyncio.run(run_batch(args, client))
+    else:
+        run_single(client, Path(args.audio_file))
+
+
 if __name__ == "__main__":
     main()
@@ -7,16 +7,56 @@ Requires: microphone and speakers (use headphones to avoid echo)
 
 Model: gemini-2.5-flash-native-audio-preview-12-2025
 
+Audio I/O runs in PyAudio callback mode: the microphone callback hands
+chunks to an asyncio queue, and the speaker callback pulls from a playback
+buffer that the receive task fills. Capture, network send/receive and
+playback overlap, and nothing blocks the event loop.
+
+Headless mode (--files) needs no audio devices: each input file is
+streamed into its own live session and the model's reply is written to a
+WAV file, with many sessions running at once. It is meant for
+regression-testing prompts from server/prompts.py against recorded
+utterances on machines without a sound card.
+
 Usage:
-  python live_audio.py [API_KEY] [VOICE]
+  python live_audio.py [API_KEY] [VOICE] [--bench]
+  python live_audio.py [API_KEY] [VOICE] --files PATH [PATH ...] [options]
 
   Voices: Puck, Charon, Kore, Fenrir, Aoede, Leda, Orus, Zephyr
+
+  --bench          print, for every reply, the time from the end of your
+                   speech to the first sample of the reply reaching the
+                   speakers, split into model/network time and local
+                   playback time; summary on exit
+
+Headless options:
+  --files PATH     WAV files (any rate, 16-bit) or raw 16 kHz mono Int16
+                   .pcm/.raw files; directories and globs are expanded
+  --out DIR        reply WAVs and results.jsonl go here (default: live_out)
+  --speed X        input pace; 1 = real time, 4 = four times faster,
+                   0 = as fast as the connection takes it (default: 1)
+  --concurrency N  live sessions open at once (default: 4)
+  --timeout S      give up on a reply after S seconds (default: 30)
+  --mode MODE      system prompt: conversation, words or songs, built from
+                   server/prompts.py (and PROMPTS_FILE) like the server does
+  --word WORD      word to teach in words mode (default: first word)
+
+  results.jsonl has one line per input: reply file, input/reply seconds,
+  setup and end-of-input -> first audio times, what the model heard and
+  said, and the prompt version, so runs can be diffed across prompt edits.
 """
 
+import argparse
 import asyncio
+import glob
+import json
 import os
+import statistics
 import sys
-import queue
+import threading
+import time
+import wave
+from collections import deque
 from pathlib import Path
 
 # Load .env file
@@ -28,26 +68,31 @@ try:
 except ImportError:
     pass
 
+# Only the microphone mode needs PortAudio
 try:
     import pyaudio
 except ImportError:
-    print("Error: pyaudio not installed")
-    print("Install with: pip install pyaudio")
-    print("On Ubuntu/Debian, you may need: sudo apt-get install portaudio19-dev")
-    sys.exit(1)
+    pyaudio = None
 
+import numpy as np
 from google import genai
 from google.genai import types
 
 # Audio configuration (16-bit PCM, mono)
 SEND_SAMPLE_RATE = 16000
 RECEIVE_SAMPLE_RATE = 24000
-CHUNK_SIZE = 1024
-FORMAT = pyaudio.paInt16
+CHUNK_SIZE = 512  # 32 ms of microphone audio per send
+OUTPUT_CHUNK_SIZE = 480  # 20 ms per speaker callback
 CHANNELS = 1
 
+# --bench end-of-speech detection on microphone chunks
+SPEECH_DBFS = -40.0
+
 MODEL = "gemini-2.5-flash-native-audio-preview-12-2025"
 
+SERVER_DIR = Path(__file__).parent.parent / 'server'
+AUDIO_SUFFIXES = ('.wav', '.pcm', '.raw')
+
 # Available voices for Live API (source: https://ai.google.dev/gemini-api/docs/live-guide)
 VOICES = [
     ("Puck", "Upbeat, energetic"),
@@ -61,27 +106,50 @@ VOICES = [
 ]
 
 
-def get_api_key():
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gemini Live native audio conversation")
+    parser.add_argument('api_key', nargs='?', help='Gemini API key (default: GOOGLE_API_KEY)')
+    parser.add_argument('voice', nargs='?', help='voice name')
+    parser.add_argument('--bench', action='store_true',
+                        help='report end-of-speech to first-played-sample latency')
+    headless = parser.add_argument_group('headless mode')
+    headless.add_argument('--files', nargs='+', metavar='PATH',
+                          help='stream these WAV/PCM files instead of the microphone')
+    headless.add_argument('--out', default='live_out', help='directory for reply WAVs and results.jsonl')
+    headless.add_argument('--speed', type=float, default=1.0,
+                          help='input pace, 1 = real time, 0 = unpaced')
+    headless.add_argument('--concurrency', type=int, default=4, help='live sessions open at once')
+    headless.add_argument('--timeout', type=float, default=30.0,
+                          help='seconds to wait for a reply once the input has been sent')
+    headless.add_argument('--mode', choices=('conversation', 'words', 'songs'),
+                          help='system prompt from server/prompts.py')
+    headless.add_argument('--word', help='word to teach in words mode')
+    return parser.parse_args()
+
+
+def get_api_key(args):
     """Get API key from args, env, or prompt."""
-    if len(sys.argv) > 1 and not sys.argv[1].startswith('-'):
-        return sys.argv[1]
+    if args.api_key:
+        return args.api_key
 
     api_key = os.environ.get("GOOGLE_API_KEY")
     if api_key and api_key != "your-api-key-here":
         return api_key
 
     print("API Key not found. Get one at: https://aistudio.google.com/apikey")
+    if args.files:
+        return None
     return input("Enter API Key: ").strip() or None
 
 
-def get_voice():
+def get_voice(args):
     """Get voice from args or prompt."""
     voice_names = [v[0] for v in VOICES]
 
-    if len(sys.argv) > 2:
-        voice = sys.argv[2]
-        if voice in voice_names:
-            return voice
+    if args.voice in voice_names:
+        return args.voice
+    if args.files:
+        return "Puck"
 
     print("\nAvailable voices:")
     for i, (name, desc) in enumerate(VOICES, 1):
@@ -93,26 +161,333 @@ def get_voice():
     return "Puck"
 
 
+class PlaybackBuffer:
+    """Model audio waiting for the speaker callback.
+
+    Written by the receive task, read by PortAudio's callback thread; the
+    callback always gets exactly the bytes it asks for, padded with silence.
+    """
+
+    def __init__(self):
+        self._chunks = deque()
+        self._offset = 0  # bytes of _chunks[0] already played
+        self._lock = threading.Lock()
+        self.on_first_sample = None  # called with the play time of a reply's first sample
+
+    def write(self, data, first_of_reply=False):
+        with self._lock:
+            self._chunks.append((data, first_of_reply))
+
+    def clear(self):
+        """Drop queued audio (the model was interrupted)."""
+        with self._lock:
+            self._chunks.clear()
+            self._offset = 0
+
+    def read(self, nbytes, play_time):
+        """`nbytes` of audio for the callback; play_time is when it will be heard."""
+        out = bytearray()
+        first_at = None
+        with self._lock:
+            while self._chunks and len(out) < nbytes:
+                data, first = self._chunks[0]
+                if first and self._offset == 0 and first_at is None:
+                    # Bytes already in `out` play before this chunk starts
+                    first_at = play_time + len(out) / 2 / RECEIVE_SAMPLE_RATE
+                take = min(nbytes - len(out), len(data) - self._offset)
+                out += data[self._offset:self._offset + take]
+                self._offset += take
+                if self._offset == len(data):
+                    self._chunks.popleft()
+                    self._offset = 0
+        if first_at is not None and self.on_first_sample is not None:
+            self.on_first_sample(first_at)
+        if len(out) < nbytes:
+            out += bytes(nbytes - len(out))
+        return bytes(out)
+
+
+class LatencyBench:
+    """End of user speech -> first played sample of the reply (--bench)."""
+
+    def __init__(self):
+        self.speech_end = None  # perf_counter time the last voiced mic chunk was captured
+        self.reply_received = None
+        self.results = []  # (total, model_and_network) seconds
+
+    def mic_chunk(self, pcm, captured_at):
+        samples = np.frombuffer(pcm, dtype='<i2').astype(np.float32)
+        dbfs = 10 * np.log10(np.mean(samples * samples) + 1e-9) - 90.309
+        if dbfs > SPEECH_DBFS:
+            self.speech_end = captured_at + len(pcm) / 2 / SEND_SAMPLE_RATE
+
+    def reply_started(self):
+        self.reply_received = time.perf_counter()
+
+    def first_sample_played(self, played_at):
+        if self.speech_end is None or self.reply_received is None:
+            return
+        total = played_at - self.speech_end
+        network = self.reply_received - self.speech_end
+        self.results.append((total, network))
+        print(f"\n[bench] speech end -> first sample {total * 1000:.0f} ms "
+              f"(model+network {network * 1000:.0f} ms, playback {(total - network) * 1000:.0f} ms)")
+        self.speech_end = None
+
+    def summary(self):
+        if not self.results:
+            print("[bench] no replies measured")
+            return
+        totals = sorted(r[0] * 1000 for r in self.results)
+        networks = [r[1] * 1000 for r in self.results]
+        print(f"[bench] {len(totals)} replies: speech end -> first sample "
+              f"p50 {statistics.median(totals):.0f} ms, min {totals[0]:.0f} ms, "
+              f"max {totals[-1]:.0f} ms; model+network p50 {statistics.median(networks):.0f} ms")
+
+
+def live_config(voice, system_prompt=None):
+    """Live session config for native audio output."""
+    config = types.LiveConnectConfig(
+        response_modalities=["AUDIO"],
+        speech_config=types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice)
+            )
+        ),
+    )
+    if system_prompt:
+        config.system_instruction = system_prompt
+        config.input_audio_transcription = types.AudioTranscriptionConfig()
+        config.output_audio_transcription = types.AudioTranscriptionConfig()
+    return config
+
+
+def load_system_prompt(mode, word):
+    """(system prompt, prompt version) built the way the server builds it."""
+    sys.path.insert(0, str(SERVER_DIR))
+    from config import PROMPTS_FILE
+    from setup_cache import SetupCache
+
+    prompt_set = SetupCache(PROMPTS_FILE).get()
+    pair = None
+    if mode == 'words':
+        pairs = [w for words in prompt_set.word_lists.values() for w in words]
+        if word:
+            pair = next((w for w in pairs if w[0] == word), None)
+            if pair is None:
+                print(f"Unknown word: {word}")
+                sys.exit(1)
+        else:
+            pair = pairs[0]
+    return prompt_set.system_prompt(mode, pair), prompt_set.version
+
+
+def expand_inputs(patterns):
+    """Input files from paths, directories and glob patterns, in order."""
+    paths = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            paths.extend(sorted(p for p in path.iterdir() if p.suffix.lower() in AUDIO_SUFFIXES))
+        elif glob.has_magic(pattern):
+            paths.extend(sorted(Path(p) for p in glob.glob(pattern, recursive=True)))
+        else:
+            paths.append(path)
+    return paths
+
+
+def load_pcm(path):
+    """16 kHz mono Int16 PCM from a WAV file, or a raw file taken as-is."""
+    if path.suffix.lower() != '.wav':
+        return path.read_bytes()
+    with wave.open(str(path), 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("only 16-bit WAV files are supported")
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        pcm = wav.readframes(wav.getnframes())
+    if channels == 1 and rate == SEND_SAMPLE_RATE:
+        return pcm
+    samples = np.frombuffer(pcm, dtype='<i2').reshape(-1, channels).mean(axis=1)
+    if rate != SEND_SAMPLE_RATE:
+        count = int(len(samples) * SEND_SAMPLE_RATE / rate)
+        samples = np.interp(np.arange(count) * rate / SEND_SAMPLE_RATE, np.arange(len(samples)), samples)
+    return np.round(samples).astype('<i2').tobytes()
+
+
+def write_wav(path, pcm, rate):
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(CHANNELS)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm)
+
+
+async def stream_file(session, pcm, speed):
+    """Send PCM in microphone-sized chunks at `speed` times real time."""
+    loop = asyncio.get_running_loop()
+    chunk_bytes = CHUNK_SIZE * 2
+    chunk_seconds = CHUNK_SIZE / SEND_SAMPLE_RATE
+    start = loop.time()
+    for i, offset in enumerate(range(0, len(pcm), chunk_bytes)):
+        await session.send_realtime_input(
+            audio=types.Blob(data=pcm[offset:offset + chunk_bytes],
+                             mime_type=f"audio/pcm;rate={SEND_SAMPLE_RATE}")
+        )
+        if speed > 0:
+            delay = start + (i + 1) * chunk_seconds / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    # Tell the server's activity detection the utterance is over
+    await session.send_realtime_input(audio_stream_end=True)
+    return time.perf_counter()
+
+
+async def collect_reply(session):
+    """Model audio and transcripts for one turn, plus when the audio started."""
+    audio = bytearray()
+    heard, said = [], []
+    first_audio_at = None
+    async for response in session.receive():
+        content = response.server_content
+        if not content:
+            continue
+        if content.model_turn:
+            for part in content.model_turn.parts:
+                if part.inline_data:
+                    if first_audio_at is None:
+                        first_audio_at = time.perf_counter()
+                    audio += part.inline_data.data
+        if content.input_transcription and content.input_transcription.text:
+            heard.append(content.input_transcription.text)
+        if content.output_transcription and content.output_transcription.text:
+            said.append(content.output_transcription.text)
+    return bytes(audio), ''.join(heard).strip(), ''.join(said).strip(), first_audio_at
+
+
+async def run_file(client, config, path, out_path, args, limit):
+    """One input file through its own live session; returns its result row."""
+    result = {'file': str(path), 'reply': None}
+    waiting_for = 'reply'
+    async with limit:
+        try:
+            pcm = load_pcm(path)
+            input_seconds = len(pcm) / 2 / SEND_SAMPLE_RATE
+            result['inputSeconds'] = round(input_seconds, 3)
+            started = time.perf_counter()
+            async with client.aio.live.connect(model=MODEL, config=config) as session:
+                result['setupMs'] = round((time.perf_counter() - started) * 1000)
+                collector = asyncio.create_task(collect_reply(session))
+                sender = asyncio.create_task(stream_file(session, pcm, args.speed))
+                try:
+                    # Streaming gets its own budget; the reply timeout starts when the input ends
+                    waiting_for = 'input'
+                    paced = input_seconds / args.speed if args.speed > 0 else 0
+                    input_end = await asyncio.wait_for(sender, paced + args.timeout)
+                    waiting_for = 'reply'
+                    audio, heard, said, first_audio_at = await asyncio.wait_for(
+                        collector, args.timeout)
+                finally:
+                    sender.cancel()
+                    collector.cancel()
+            if first_audio_at is not None:
+                # Negative if the model answered before the file ended
+                result['firstAudioMs'] = round((first_audio_at - input_end) * 1000)
+            result['replySeconds'] = round(len(audio) / 2 / RECEIVE_SAMPLE_RATE, 3)
+            result['heard'] = heard
+            result['said'] = said
+            if audio:
+                write_wav(out_path, audio, RECEIVE_SAMPLE_RATE)
+                result['reply'] = str(out_path)
+        except asyncio.TimeoutError:
+            if waiting_for == 'input':
+                result['error'] = "timed out streaming the input"
+            else:
+                result['error'] = f"no reply within {args.timeout:g} s of the input ending"
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+    status = result.get('error') or (
+        f"{result['replySeconds']:.1f} s reply, first audio {result.get('firstAudioMs', '-')} ms")
+    print(f"{path.name}: {status}")
+    return result
+
+
+async def run_headless(args, client, voice):
+    """Stream every input file through a live session and save the replies."""
+    paths = expand_inputs(args.files)
+    if not paths:
+        print("No input files found.")
+        sys.exit(1)
+    prompt, version = (None, None)
+    if args.mode:
+        prompt, version = load_system_prompt(args.mode, args.word)
+    config = live_config(voice, prompt)
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # Reply file per input; inputs from different directories can share a stem
+    out_paths = []
+    used = set()
+    for path in paths:
+        name = path.stem
+        n = 1
+        while name in used:
+            n += 1
+            name = f"{path.stem}-{n}"
+        used.add(name)
+        out_paths.append(out_dir / f"{name}.wav")
+
+    print(f"Streaming {len(paths)} file(s) at {args.speed:g}x, {args.concurrency} at a time "
+          f"(voice {voice}, prompt {args.mode or 'none'}{f' v{version}' if version else ''})")
+    limit = asyncio.Semaphore(max(1, args.concurrency))
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        run_file(client, config, path, out_path, args, limit)
+        for path, out_path in zip(paths, out_paths)
+    ))
+    elapsed = time.perf_counter() - started
+
+    with open(out_dir / 'results.jsonl', 'w') as f:
+        for result in results:
+            result.update(voice=voice, mode=args.mode, word=args.word, promptVersion=version)
+            f.write(json.dumps(result) + '\n')
+
+    failed = sum(1 for r in results if 'error' in r)
+    latencies = sorted(r['firstAudioMs'] for r in results if 'firstAudioMs' in r)
+    print("-" * 60)
+    print(f"{len(results) - failed} replied, {failed} failed in {elapsed:.1f} s; "
+          f"results in {out_dir / 'results.jsonl'}")
+    if latencies:
+        print(f"end of input -> first audio: p50 {statistics.median(latencies):.0f} ms, "
+              f"max {latencies[-1]:.0f} ms")
+    if failed:
+        sys.exit(1)
+
+
 async def main():
-    api_key = get_api_key()
+    args = parse_args()
+    api_key = get_api_key(args)
     if not api_key:
         print("No API key provided. Exiting.")
         sys.exit(1)
 
-    voice = get_voice()
+    voice = get_voice(args)
 
     # Initialize client
     client = genai.Client(api_key=api_key, http_options={"api_version": "v1alpha"})
 
-    # Configure for native audio output
-    config = types.LiveConnectConfig(
-        response_modalities=["AUDIO"],
-        speech_config=types.SpeechConfig(
-            voice_config=types.VoiceConfig(
-                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice)
-            )
-        ),
-    )
+    if args.files:
+        await run_headless(args, client, voice)
+        return
+
+    if pyaudio is None:
+        print("Error: pyaudio not installed")
+        print("Install with: pip install pyaudio")
+        print("On Ubuntu/Debian, you may need: sudo apt-get install portaudio19-dev")
+        print("Or run without audio devices using --files")
+        sys.exit(1)
+
+    config = live_config(voice)
 
     print("=" * 60)
     print("Gemini 2.5 Flash Native Audio - Live Conversation")
@@ -123,56 +498,86 @@ async def main():
     print("Speak into your microphone. Press Ctrl+C to exit.")
     print("-" * 60)
 
-    # Audio queues
-    audio_in_queue = queue.Queue()
-    audio_out_queue = queue.Queue()
+    loop = asyncio.get_running_loop()
+    bench = LatencyBench() if args.bench else None
+
+    # Microphone chunks from the PortAudio thread, with their capture time
+    audio_in_queue = asyncio.Queue()
+    # Model audio for the speaker callback
+    playback = PlaybackBuffer()
+    if bench:
+        # Called on the PortAudio thread; report from the event loop
+        playback.on_first_sample = lambda t: loop.call_soon_threadsafe(bench.first_sample_played, t)
+
+    def on_mic(in_data, frame_count, time_info, status):
+        # Time the first sample was captured, on the perf_counter clock
+        captured_at = time.perf_counter() - (time_info['current_time'] - time_info['input_buffer_adc_time'])
+        loop.call_soon_threadsafe(audio_in_queue.put_nowait, (in_data, captured_at))
+        return None, pyaudio.paContinue
+
+    def on_speaker(in_data, frame_count, time_info, status):
+        # Time this buffer will reach the DAC, on the perf_counter clock
+        play_time = time.perf_counter() + (time_info['output_buffer_dac_time'] - time_info['current_time'])
+        return playback.read(frame_count * 2, play_time), pyaudio.paContinue
 
     pya = pyaudio.PyAudio()
 
     async with client.aio.live.connect(model=MODEL, config=config) as session:
-        # Set up audio output stream
         output_stream = pya.open(
-            format=FORMAT,
+            format=pyaudio.paInt16,
             channels=CHANNELS,
             rate=RECEIVE_SAMPLE_RATE,
             output=True,
+            frames_per_buffer=OUTPUT_CHUNK_SIZE,
+            stream_callback=on_speaker,
         )
-
-        # Set up audio input stream
         input_stream = pya.open(
-            format=FORMAT,
+            format=pyaudio.paInt16,
             channels=CHANNELS,
             rate=SEND_SAMPLE_RATE,
             input=True,
             frames_per_buffer=CHUNK_SIZE,
+            stream_callback=on_mic,
         )
 
         async def send_audio():
-            """Continuously send microphone audio to Gemini."""
+            """Send microphone chunks to Gemini as the callback delivers them."""
             while True:
+                data, captured_at = await audio_in_queue.get()
+                if bench:
+                    bench.mic_chunk(data, captured_at)
                 try:
-                    data = input_stream.read(CHUNK_SIZE, exception_on_overflow=False)
                     await session.send_realtime_input(
-                        audio=types.Blob(data=data, mime_type="audio/pcm")
+                        audio=types.Blob(data=data, mime_type=f"audio/pcm;rate={SEND_SAMPLE_RATE}")
                     )
-                    await asyncio.sleep(0.01)
                 except Exception as e:
                     print(f"Send error: {e}")
                     break
 
         async def receive_audio():
-            """Receive and play audio responses from Gemini."""
+            """Receive Gemini audio into the playback buffer."""
+            new_reply = True
             while True:
                 try:
                     turn = session.receive()
                     async for response in turn:
-                        if response.server_content:
-                            if response.server_content.model_turn:
-                                for part in response.server_content.model_turn.parts:
-                                    if part.inline_data:
-                                        output_stream.write(part.inline_data.data)
-                            if response.server_content.output_transcription:
-                                print(f"\nGemini: {response.server_content.output_transcription.text}")
+                        content = response.server_content
+                        if not content:
+                            continue
+                        if content.interrupted:
+                            playback.clear()
+                            new_reply = True
+                        if content.model_turn:
+                            for part in content.model_turn.parts:
+                                if part.inline_data:
+                                    if new_reply and bench:
+                                        bench.reply_started()
+                                    playback.write(part.inline_data.data, first_of_reply=new_reply)
+                                    new_reply = False
+                        if content.output_transcription:
+                            print(f"\nGemini: {content.output_transcription.text}")
+                        if content.turn_complete:
+                            new_reply = True
                 except Exception as e:
                     print(f"Receive error: {e}")
                     break
@@ -184,7 +589,7 @@ async def main():
                 send_audio(),
                 receive_audio(),
             )
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError):
             print("\n\nEnding conversation...")
         finally:
             input_stream.stop_stream()
@@ -192,6 +597,8 @@ async def main():
             output_stream.stop_stream()
             output_stream.close()
             pya.terminate()
+            if bench:
+                bench.summary()
 
     print("Goodbye!")
 
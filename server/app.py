@@ -4,53 +4,61 @@ TinyTalk - Flask backend with WebSocket proxy to Gemini Live API.
 Keeps API key secure server-side and adds educational prompts.
 """
 
-import os
 import json
 import asyncio
 import random
 import time
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Flask, render_template, send_from_directory, request, jsonify
+from flask import Flask, Response, render_template, send_from_directory, request, jsonify
 from flask_sock import Sock
-import websockets
-
-from prompts import (
-    TODDLER_TEACHER_PROMPT,
-    WORD_TEACHING_PROMPT,
-    CONVERSATION_PROMPT,
-    SONG_PROMPT,
-    WORD_LISTS,
-    GREETINGS,
-    ENCOURAGEMENTS,
-    GOODBYES,
-)
 
-# Load .env file
-try:
-    from dotenv import load_dotenv
-    env_file = Path(__file__).parent.parent / '.env'
-    if env_file.exists():
-        load_dotenv(env_file)
-except ImportError:
-    pass
+from config import (
+    API_KEY, VOICES, DEFAULT_VOICE, MAX_SESSION_DURATION, VAD_MODE,
+    FRAME_MS, MAX_LIVE_SESSIONS, SESSION_DURATION_LIMIT, STATE_DB, TRANSCRIPTS,
+)
+from curriculum import WordCurriculum
+from framing import AUDIO_FORMAT_JSON, AUDIO_FORMATS, RECEIVE_SAMPLE_RATE, SEND_SAMPLE_RATE
+import metrics
+import prompts
+from progress import ProgressStore
+from proxy import (
+    FlaskSockClient, audio_recorder, phrase_cache, run_proxy, transcript_log, upstream_pool,
+    upstream_dialer, warm_phrases,
+)
+from phrases import phrase_key, wav_bytes
+from rechunk import MIN_FRAME_MS, MAX_FRAME_MS
+from registry import SessionRegistry
+from resample import RATES as RESAMPLE_RATES
+from setup_cache import setup_cache
+from state import SessionStore
+from vad import VAD_MODES, VAD_OFF, VoiceActivityDetector, snapshot as vad_snapshot
+from wordlists import MAX_PAGE, WordListStore, clean_words, valid_name
 
 app = Flask(__name__, static_folder='../web', static_url_path='')
 sock = Sock(app)
 
-# Configuration
-API_KEY = os.environ.get('GOOGLE_API_KEY', '')
-MODEL = 'gemini-2.5-flash-native-audio-preview-12-2025'
-VOICES = ['Aoede', 'Leda', 'Puck']  # Child-appropriate voices
-DEFAULT_VOICE = 'Aoede'
-
-# Session management
-sessions = {}
-MAX_SESSION_DURATION = 600  # 10 minutes default
+# Session management: live sessions in this process, shared state in SQLite
+sessions = SessionRegistry(MAX_LIVE_SESSIONS)
+session_store = SessionStore(STATE_DB)
+progress = ProgressStore(STATE_DB)
+word_lists = WordListStore(STATE_DB, prompts.WORD_LISTS)
+setup_cache.on_reload(lambda: word_lists.set_builtin(prompts.WORD_LISTS))
+# SQLite can wait seconds on another worker's lock, so relay-side writes go
+# through one thread, in order, instead of blocking the event loop
+state_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='state-writer')
+metrics.Gauge('tinytalk_sessions_active', 'Live proxy sessions.', lambda: len(sessions))
 
 
 class Session:
     """Track session state and timing."""
+    __slots__ = (
+        'id', 'mode', 'voice', 'start_time', 'max_duration', 'current_word',
+        'word_index', 'stars', 'audio_format', 'vad', 'frame_ms', 'curriculum',
+        'transcript', 'child_id', 'record', 'reconnects', 'outbound',
+        'input_rate', 'output_rate',
+    )
+
     def __init__(self, session_id, mode='conversation', voice=DEFAULT_VOICE, max_duration=MAX_SESSION_DURATION):
         self.id = session_id
         self.mode = mode
@@ -60,6 +68,17 @@ class Session:
         self.current_word = None
         self.word_index = 0
         self.stars = 0
+        self.audio_format = AUDIO_FORMAT_JSON
+        self.vad = None
+        self.frame_ms = 0  # 0 = forward client chunks unchanged
+        self.curriculum = None
+        self.transcript = TRANSCRIPTS
+        self.child_id = None  # whose progress rollups this session feeds, if anyone's
+        self.record = False
+        self.reconnects = 0  # upstream connections replaced mid-session
+        self.outbound = None  # OutboundQueue while relaying
+        self.input_rate = SEND_SAMPLE_RATE  # client audio; resampled upstream if different
+        self.output_rate = RECEIVE_SAMPLE_RATE  # model audio as the client wants it
 
     def is_expired(self):
         return time.time() - self.start_time > self.max_duration
@@ -69,15 +88,7 @@ class Session:
 
     def get_system_prompt(self):
         """Get the appropriate system prompt for the current mode."""
-        base = TODDLER_TEACHER_PROMPT
-
-        if self.mode == 'words' and self.current_word:
-            word, desc = self.current_word
-            return base + '\n\n' + WORD_TEACHING_PROMPT.format(word=word, category=desc)
-        elif self.mode == 'songs':
-            return base + '\n\n' + SONG_PROMPT
-        else:
-            return base + '\n\n' + CONVERSATION_PROMPT
+        return setup_cache.get().system_prompt(self.mode, self.current_word)
 
 
 @app.route('/')
@@ -105,160 +116,340 @@ def get_config():
         'voices': VOICES,
         'defaultVoice': DEFAULT_VOICE,
         'modes': ['conversation', 'words', 'songs'],
-        'wordCategories': list(WORD_LISTS.keys()),
+        'wordCategories': list(prompts.WORD_LISTS.keys()),
         'maxSessionDuration': MAX_SESSION_DURATION,
     })
 
 
+def page_args(default_limit):
+    limit = min(max(request.args.get('limit', default_limit, type=int), 1), MAX_PAGE)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    return offset, limit
+
+
+def json_response(body, status=200):
+    return Response(body, status=status, mimetype='application/json')
+
+
 @app.route('/api/words/<category>')
 def get_words(category):
-    """Get word list for a category."""
-    if category in WORD_LISTS:
-        return jsonify([{'word': w, 'hint': h} for w, h in WORD_LISTS[category]])
-    return jsonify([])
+    """Word list for a category: ?family=<id>'s own list if it has one, else built-in.
+
+    Paged with offset/limit; the list's full length is in X-Total-Count.
+    """
+    offset, limit = page_args(MAX_PAGE)
+    result = word_lists.page(request.args.get('family'), category, offset, limit)
+    if result is None:
+        return jsonify([])
+    body, total = result
+    response = json_response(body)
+    response.headers['X-Total-Count'] = str(total)
+    return response
+
+
+@app.route('/api/wordlists')
+def get_word_lists():
+    """A family's custom word lists (?family=<id>), paged, plus the built-in categories."""
+    family = request.args.get('family')
+    if not valid_name(family):
+        return jsonify({'error': 'family is required'}), 400
+    return json_response(word_lists.lists(family, *page_args(100)))
+
+
+@app.route('/api/wordlists/search')
+def search_word_lists():
+    """Words in a family's custom lists starting with ?q=, paged."""
+    family = request.args.get('family')
+    query = request.args.get('q', '')
+    if not valid_name(family) or not query or len(query) > 64:
+        return jsonify({'error': 'family and q are required'}), 400
+    return json_response(word_lists.search(family, query, *page_args(50)))
+
+
+@app.route('/api/wordlists/<category>', methods=['PUT', 'DELETE'])
+def edit_word_list(category):
+    """Create or replace (PUT {"words": [...], "language": ...}) or delete a family's list."""
+    family = request.args.get('family')
+    if not valid_name(family) or not valid_name(category):
+        return jsonify({'error': 'family and category must be 1 to 64 characters'}), 400
+    if request.method == 'DELETE':
+        if not word_lists.delete(family, category):
+            return jsonify({'error': 'No such list'}), 404
+        return jsonify({'deleted': category})
+    body = request.get_json(silent=True) or {}
+    language = body.get('language')
+    if language is not None and not (isinstance(language, str) and len(language) <= 35):
+        return jsonify({'error': 'language must be a language tag'}), 400
+    try:
+        words = clean_words(body.get('words'), category)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(word_lists.put(family, category, words, language))
+
+
+PHRASE_FORMATS = ('pcm', 'wav')
+
+
+def phrase_response(field, texts):
+    """A random phrase, with a link to its audio in the requested voice.
+
+    ?format=pcm or ?format=wav returns the audio itself instead.
+    """
+    text = random.choice(texts)
+    voice = request.args.get('voice', DEFAULT_VOICE)
+    if voice not in VOICES:
+        return jsonify({'error': f'Unknown voice {voice!r}'}), 400
+    audio_format = request.args.get('format')
+    if audio_format in PHRASE_FORMATS:
+        return phrase_audio(phrase_cache.get(text, voice), audio_format)
+    return jsonify({field: text, 'audio': f'/api/phrases/{phrase_key(text, voice)}.wav'})
+
+
+def phrase_audio(pcm, audio_format):
+    if pcm is None:
+        # Rendering in the background (or warm-up is); never inside a request
+        response = jsonify({'status': 'Phrase audio is being rendered, try again shortly'})
+        response.status_code = 202
+        response.headers['Retry-After'] = '2'
+        return response
+    if audio_format == 'wav':
+        response = Response(wav_bytes(pcm), mimetype='audio/wav')
+    else:
+        response = Response(pcm, mimetype=f'audio/pcm;rate={RECEIVE_SAMPLE_RATE}')
+    # Keyed by text and voice, so a key's audio never changes
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 
 @app.route('/api/greeting')
 def get_greeting():
     """Get a random greeting."""
-    return jsonify({'greeting': random.choice(GREETINGS)})
+    return phrase_response('greeting', prompts.GREETINGS)
 
 
 @app.route('/api/encouragement')
 def get_encouragement():
     """Get a random encouragement."""
-    return jsonify({'message': random.choice(ENCOURAGEMENTS)})
+    return phrase_response('message', prompts.ENCOURAGEMENTS)
 
 
-@sock.route('/ws')
-def websocket_proxy(ws):
-    """WebSocket proxy to Gemini Live API."""
+@app.route('/api/phrases/<key>.<audio_format>')
+def get_phrase_audio(key, audio_format):
+    """Audio for a canned phrase; 202 while it's first rendered."""
+    if audio_format not in PHRASE_FORMATS or key not in phrase_cache.phrases:
+        return jsonify({'error': 'Unknown phrase'}), 404
+    return phrase_audio(phrase_cache.get_key(key), audio_format)
 
-    if not API_KEY:
-        ws.send(json.dumps({'error': 'API key not configured'}))
-        return
 
-    # Get session config from first message
-    try:
-        config_msg = ws.receive(timeout=5)
-        config = json.loads(config_msg)
-    except Exception as e:
-        ws.send(json.dumps({'error': f'Invalid config: {e}'}))
-        return
+@app.route('/api/phrases')
+def get_phrase_stats():
+    """Phrase audio cache occupancy and hit rate."""
+    return jsonify(phrase_cache.stats())
+
+
+@app.route('/api/prompts')
+def get_prompt_version():
+    """Current prompt version and precompiled setup payload count."""
+    setup_cache.get()
+    return jsonify(setup_cache.stats())
+
+
+@app.route('/api/pool')
+def get_pool_stats():
+    """Upstream connection pool hits, misses and idle connections, and dial stats."""
+    return jsonify({**upstream_pool.stats(), 'dial': upstream_dialer.stats()})
+
+
+@app.route('/api/vad')
+def get_vad_stats():
+    """Client audio chunks seen and suppressed by server-side VAD."""
+    vad_totals = vad_snapshot()
+    return jsonify({
+        'chunks': vad_totals['chunks'],
+        'suppressed': vad_totals['suppressed'],
+        'bytesSuppressed': vad_totals['bytes_suppressed'],
+    })
+
+
+@app.route('/api/transcripts')
+def get_transcript_stats():
+    """Transcript events recorded, written and shed under backpressure."""
+    return jsonify(transcript_log.stats())
+
+
+@app.route('/api/recordings')
+def get_recording_stats():
+    """Active recordings and audio bytes written or dropped."""
+    return jsonify(audio_recorder.stats())
 
+
+@app.route('/api/stats')
+def get_stats():
+    """Progress rollups for ?child=<id>."""
+    child = request.args.get('child')
+    if not child:
+        return jsonify({'error': 'child is required'}), 400
+    days = min(max(request.args.get('days', 7, type=int), 1), 366)
+    stats = progress.stats(child, days=days)
+    if stats is None:
+        return jsonify({'error': 'No progress for this child yet'}), 404
+    return jsonify(stats)
+
+
+@app.route('/metrics')
+def get_metrics():
+    """Proxy latency histograms and counters in Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/sessions')
+def get_sessions():
+    """Live session count, capacity, and age/time remaining per session."""
+    return jsonify(sessions.snapshot())
+
+
+def open_session(config):
+    """Create and register a Session from the client's config message.
+
+    Returns None if the server is already at its live session limit.
+    """
     session_id = config.get('sessionId', str(time.time()))
     mode = config.get('mode', 'conversation')
     voice = config.get('voice', DEFAULT_VOICE)
     max_duration = config.get('maxDuration', MAX_SESSION_DURATION)
     word_category = config.get('wordCategory', 'animals')
+    audio_format = config.get('audioFormat', AUDIO_FORMAT_JSON)
+    vad_mode = config.get('vad', VAD_MODE)
+    frame_ms = config.get('frameMs', FRAME_MS)
+    transcript = config.get('transcript', TRANSCRIPTS)
+    child_id = config.get('childId')
+    family = config.get('familyId')
+    record = config.get('record', False)
+    input_rate = config.get('inputRate')
+    output_rate = config.get('outputRate')
 
     # Validate voice
     if voice not in VOICES:
         voice = DEFAULT_VOICE
 
+    # Keep client-chosen limits bounded so sessions can always be reaped
+    try:
+        max_duration = min(float(max_duration), SESSION_DURATION_LIMIT)
+    except (TypeError, ValueError):
+        max_duration = MAX_SESSION_DURATION
+
     # Create session
     session = Session(session_id, mode, voice, max_duration)
-
-    # If in word mode, set up word list
-    if mode == 'words' and word_category in WORD_LISTS:
-        words = WORD_LISTS[word_category]
+    if audio_format in AUDIO_FORMATS:
+        session.audio_format = audio_format
+    if vad_mode in VAD_MODES and vad_mode != VAD_OFF:
+        session.vad = VoiceActivityDetector(vad_mode)
+    if isinstance(frame_ms, int) and MIN_FRAME_MS <= frame_ms <= MAX_FRAME_MS:
+        session.frame_ms = frame_ms
+    session.transcript = transcript is True
+    session.record = record is True
+    if input_rate in RESAMPLE_RATES:
+        session.input_rate = input_rate
+    if output_rate in RESAMPLE_RATES:
+        session.output_rate = output_rate
+    if isinstance(child_id, str) and child_id:
+        session.child_id = child_id[:64]
+
+    if not sessions.add(session):
+        return None
+
+    # Resume time and progress if this session id connected before; only
+    # once admitted, so a rejected connection never starts the clock
+    try:
+        resumed = session_store.restore(session)
+    except Exception:
+        sessions.remove(session)
+        raise
+    if resumed:
+        sessions.reschedule(session)
+
+    # If in word mode, set up word list (the family's own, if it has one)
+    if mode == 'words':
+        words = word_lists.words(family if valid_name(family) else None, word_category)
         if words:
-            session.current_word = words[0]
+            session.curriculum = WordCurriculum(
+                session, words, on_change=save_later, on_progress=record_progress_later,
+            )
 
-    sessions[session_id] = session
+    if not resumed and session.child_id is not None:
+        progress.session_started(session.child_id)
+    return session
 
-    # Connect to Gemini
-    gemini_url = f'wss://generativelanguage.googleapis.com/ws/google.ai.generativelanguage.v1alpha.GenerativeService.BidiGenerateContent?key={API_KEY}'
 
-    async def run_proxy():
+def write_state(func, *args):
+    """Run a store write on the state writer thread; returns its future."""
+    def write():
         try:
-            async with websockets.connect(gemini_url) as gemini_ws:
-                # Send setup with system prompt
-                setup_msg = {
-                    'setup': {
-                        'model': f'models/{MODEL}',
-                        'generation_config': {
-                            'response_modalities': ['AUDIO'],
-                            'speech_config': {
-                                'voice_config': {
-                                    'prebuilt_voice_config': {
-                                        'voice_name': session.voice
-                                    }
-                                }
-                            }
-                        },
-                        'system_instruction': {
-                            'parts': [{'text': session.get_system_prompt()}]
-                        }
-                    }
-                }
-                await gemini_ws.send(json.dumps(setup_msg))
-
-                # Wait for setup complete
-                setup_response = await gemini_ws.recv()
-                ws.send(setup_response)
-
-                # Bidirectional proxy
-                async def client_to_gemini():
-                    """Forward client audio to Gemini."""
-                    while not session.is_expired():
-                        try:
-                            data = ws.receive(timeout=0.1)
-                            if data:
-                                await gemini_ws.send(data)
-                        except Exception:
-                            await asyncio.sleep(0.05)
-
-                async def gemini_to_client():
-                    """Forward Gemini responses to client."""
-                    while not session.is_expired():
-                        try:
-                            response = await asyncio.wait_for(gemini_ws.recv(), timeout=0.1)
-                            ws.send(response)
-                        except asyncio.TimeoutError:
-                            continue
-                        except Exception as e:
-                            print(f"Gemini receive error: {e}")
-                            break
-
-                    # Session expired - send goodbye
-                    if session.is_expired():
-                        goodbye = random.choice(GOODBYES)
-                        ws.send(json.dumps({
-                            'sessionEnd': {
-                                'reason': 'timeout',
-                                'message': goodbye,
-                                'stars': session.stars
-                            }
-                        }))
-
-                async def timer_check():
-                    """Check session timer and send updates."""
-                    while not session.is_expired():
-                        await asyncio.sleep(30)
-                        remaining = session.time_remaining()
-                        ws.send(json.dumps({
-                            'timeUpdate': {
-                                'remaining': remaining,
-                                'stars': session.stars
-                            }
-                        }))
-
-                await asyncio.gather(
-                    client_to_gemini(),
-                    gemini_to_client(),
-                    timer_check()
-                )
-
+            func(*args)
         except Exception as e:
-            print(f"Proxy error: {e}")
-            ws.send(json.dumps({'error': str(e)}))
-        finally:
-            if session_id in sessions:
-                del sessions[session_id]
+            print(f"State write failed: {e}")
+    return state_writer.submit(write)
+
+
+def save_later(session):
+    write_state(session_store.save, session)
+
+
+def record_progress_later(session, event, word):
+    write_state(record_progress, session, event, word)
+
+
+def close_session(session, seconds):
+    session_store.save(session)
+    if session.child_id is not None:
+        progress.session_time(session.child_id, seconds)
+
 
+def record_progress(session, event, word):
+    """Fold a curriculum star or learned word into the child's rollups."""
+    if session.child_id is None:
+        return
+    if event == 'star':
+        progress.star(session.child_id, word)
+    elif event == 'learned':
+        progress.learned(session.child_id, word)
+
+
+async def serve_client(client):
+    """Handle one /ws connection: read config, then proxy to Gemini."""
+    if not API_KEY:
+        await client.send(json.dumps({'error': 'API key not configured'}))
+        await client.close()
+        return
+
+    # Get session config from first message
+    try:
+        config_msg = await client.receive(timeout=5)
+        config = json.loads(config_msg)
+    except Exception as e:
+        await client.send(json.dumps({'error': f'Invalid config: {e}'}))
+        await client.close()
+        return
+
+    session = await asyncio.to_thread(open_session, config)
+    if session is None:
+        await client.send(json.dumps({'error': 'Server is busy, please try again soon'}))
+        await client.close()
+        return
+    connected = time.monotonic()
+    try:
+        await run_proxy(client, session)
+    finally:
+        sessions.remove(session)
+        # After the session's queued writes, so its final state wins
+        await asyncio.wrap_future(write_state(close_session, session, time.monotonic() - connected))
+
+
+@sock.route('/ws')
+def websocket_proxy(ws):
+    """WebSocket proxy to Gemini Live API."""
     # Run async proxy in sync context
-    asyncio.run(run_proxy())
+    asyncio.run(serve_client(FlaskSockClient(ws)))
 
 
 if __name__ == '__main__':
@@ -273,4 +464,5 @@ if __name__ == '__main__':
     print(f"Parent dashboard: http://localhost:5000/parent")
     print("="*50 + "\n")
 
+    warm_phrases()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+TinyTalk - asyncio-native server.
+
+Runs every /ws proxy session (client and Gemini sockets) on a single event
+loop per process, instead of one thread plus asyncio.run() per connection.
+REST routes and static files are still served by the Flask app in app.py.
+
+Run with:
+  uvicorn asgi:app --host 0.0.0.0 --port 5000 [--workers N]
+or:
+  WORKERS=N python asgi.py
+
+With N workers, uvicorn forks N processes that share the listening socket.
+Session time limits and progress are kept in a shared SQLite store
+(state.py), so they hold whichever worker a child reconnects to, and
+/metrics sums every worker's numbers (set WORKERS=N for that when
+starting uvicorn directly).
+"""
+
+import asyncio
+from pathlib import Path
+
+from asgiref.wsgi import WsgiToAsgi
+
+import metrics
+from app import app as flask_app, serve_client
+from config import API_KEY, METRICS_DIR, WORKERS
+from proxy import audio_recorder, transcript_log, upstream_pool, warm_phrases, warm_upstream_keys
+
+flask_asgi = WsgiToAsgi(flask_app)
+
+
+class ASGIClient:
+    """Async client interface on top of an ASGI websocket connection."""
+
+    def __init__(self, receive, send):
+        self._receive = receive
+        self._send = send
+        self.closed = False
+
+    async def receive(self, timeout=None):
+        if self.closed:
+            return None
+        try:
+            message = await asyncio.wait_for(self._next_message(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return message
+
+    async def _next_message(self):
+        while True:
+            message = await self._receive()
+            if message['type'] == 'websocket.receive':
+                if message.get('text') is not None:
+                    return message['text']
+                return message.get('bytes')
+            if message['type'] == 'websocket.disconnect':
+                self.closed = True
+                return None
+
+    async def send(self, data):
+        if self.closed:
+            return
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            message = {'type': 'websocket.send', 'bytes': bytes(data)}
+        else:
+            message = {'type': 'websocket.send', 'text': data}
+        try:
+            await self._send(message)
+        except OSError:
+            # Client went away mid-send; the receive side will see the disconnect
+            self.closed = True
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self._send({'type': 'websocket.close', 'code': 1000})
+        except Exception:
+            pass
+
+
+async def lifespan(receive, send):
+    """ASGI lifespan: start and stop the upstream pool, warm phrases, flush transcripts and recordings."""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if WORKERS > 1:
+                metrics.share(METRICS_DIR)
+            upstream_pool.start(warm_upstream_keys)
+            warm_phrases()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await upstream_pool.stop()
+            await asyncio.to_thread(transcript_log.close)
+            await asyncio.to_thread(audio_recorder.close)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point: native /ws proxy, Flask for everything else."""
+    if scope['type'] == 'websocket':
+        if scope['path'] != '/ws':
+            await send({'type': 'websocket.close', 'code': 1008})
+            return
+        message = await receive()
+        if message['type'] != 'websocket.connect':
+            return
+        await send({'type': 'websocket.accept'})
+        await serve_client(ASGIClient(receive, send))
+    elif scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    else:
+        await flask_asgi(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    if not API_KEY:
+        print("WARNING: GOOGLE_API_KEY not set!")
+        print("Set it with: export GOOGLE_API_KEY=your-key")
+
+    print("\n" + "="*50)
+    print("TinyTalk Server (asyncio)")
+    print("="*50)
+    print(f"Open http://localhost:5000 in your browser")
+    print(f"Parent dashboard: http://localhost:5000/parent")
+    print(f"Workers: {WORKERS}")
+    print("="*50 + "\n")
+
+    if WORKERS > 1:
+        # Totals start from zero with each server run
+        for path in Path(METRICS_DIR).glob('*.json'):
+            path.unlink()
+
+    uvicorn.run('asgi:app', host='0.0.0.0', port=5000, workers=WORKERS)
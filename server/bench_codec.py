@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Client-leg codec benchmark.
+
+Measures mu-law encode/decode throughput (codec.py) on synthetic speech-
+band noise, the CPU that costs one real-time stream, and the client-leg
+bandwidth of each audio format for one second of conversation.
+
+Usage:
+  python bench_codec.py [--seconds 20]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from codec import mulaw_decode, mulaw_encode
+from framing import RECEIVE_SAMPLE_RATE, SEND_SAMPLE_RATE, realtime_audio_message, server_audio_message
+
+
+def noise(rate, ms):
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(rate * ms // 1000) * 3000).astype('<i2').tobytes()
+
+
+def throughput(func, chunk, seconds_of_audio, chunk_seconds):
+    """(CPU seconds per chunk, CPU seconds per second of audio)."""
+    for _ in range(100):
+        func(chunk)
+    count = int(seconds_of_audio / chunk_seconds)
+    started = time.thread_time()
+    for _ in range(count):
+        func(chunk)
+    cpu = time.thread_time() - started
+    return cpu / count, cpu / (count * chunk_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=20.0, help='audio per case')
+    args = parser.parse_args()
+
+    up_pcm = noise(SEND_SAMPLE_RATE, 20)
+    down_pcm = noise(RECEIVE_SAMPLE_RATE, 40)
+    cases = (
+        ('decode client 16 kHz', mulaw_decode, mulaw_encode(up_pcm), 0.02),
+        ('encode model 24 kHz', mulaw_encode, down_pcm, 0.04),
+    )
+    print(f"{'':22} {'chunk':>6} {'us/chunk':>9} {'MB/s PCM':>9} {'core/stream':>12}")
+    for name, func, chunk, chunk_seconds in cases:
+        per_chunk, per_second = throughput(func, chunk, args.seconds, chunk_seconds)
+        pcm_bytes = len(chunk) * (2 if func is mulaw_decode else 1)
+        print(f"{name:22} {chunk_seconds * 1000:>4.0f}ms {per_chunk * 1e6:>9.2f} "
+              f"{pcm_bytes / per_chunk / 1e6:>9.0f} {per_second * 100:>11.4f}%")
+
+    # Bytes on the client leg per second of audio each way, 20 ms / 40 ms frames
+    up_frames = [up_pcm] * 50
+    down_frames = [down_pcm] * 25
+    formats = (
+        ('json', sum(len(realtime_audio_message(f)) for f in up_frames),
+         sum(len(server_audio_message(f, RECEIVE_SAMPLE_RATE)) for f in down_frames)),
+        ('pcm16', len(up_pcm) * 50, len(down_pcm) * 25),
+        ('mulaw', len(up_pcm) // 2 * 50, len(down_pcm) // 2 * 25),
+        ('mulaw, outputRate 16000', len(up_pcm) // 2 * 50, len(down_pcm) // 3 * 25),
+    )
+    json_total = formats[0][1] + formats[0][2]
+    print(f"\n{'format':24} {'up KB/s':>8} {'down KB/s':>10} {'vs json':>8}")
+    for name, up, down in formats:
+        print(f"{name:24} {up / 1000:>8.1f} {down / 1000:>10.1f} {json_total / (up + down):>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
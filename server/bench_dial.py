@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Upstream dial benchmark.
+
+Opens --dials upstream connections one after another with a plain
+websockets.connect(), then as many with dial.UpstreamDialer. Each sends a
+setup message and waits for setupComplete. Reports the dialer's p50 per
+phase (DNS, TCP, TLS, upgrade, setup) and both paths' time to
+setupComplete. Point it at mock_gemini.py, with --tls-cert so TLS is
+measured.
+
+Usage:
+  python mock_gemini.py --tls-cert mock.crt --tls-key mock.key
+  python bench_dial.py --url 'wss://localhost:9000/ws?key=x' --ca-file mock.crt
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import websockets
+
+from dial import UpstreamDialer, tls_context
+from setup_cache import build_setup_message
+
+SETUP = json.dumps(build_setup_message('Aoede', 'You are a friendly teacher.'))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def setup(ws):
+    started = time.perf_counter()
+    await ws.send(SETUP)
+    await ws.recv()
+    return time.perf_counter() - started
+
+
+async def plain(url, ca_file, dials):
+    kwargs = {}
+    if url.startswith('wss:') and ca_file:
+        kwargs['ssl'] = tls_context(ca_file)
+    totals = []
+    for _ in range(dials):
+        started = time.perf_counter()
+        async with websockets.connect(url, **kwargs) as ws:
+            await setup(ws)
+            totals.append(time.perf_counter() - started)
+    return totals
+
+
+async def dialer(url, ca_file, dials):
+    dialer = UpstreamDialer(cafile=ca_file)
+    totals = []
+    phases = {name: [] for name in ('dns', 'tcp', 'tls', 'upgrade', 'setup')}
+    for _ in range(dials):
+        started = time.perf_counter()
+        ws, timings = await dialer.connect(url)
+        async with ws:
+            phases['setup'].append(await setup(ws))
+            totals.append(time.perf_counter() - started)
+        for name in ('dns', 'tcp', 'tls', 'upgrade'):
+            value = getattr(timings, name)
+            if value is not None:
+                phases[name].append(value)
+    return totals, phases, dialer.stats()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='ws://localhost:9000/ws?key=x')
+    parser.add_argument('--ca-file', help='CA bundle for a wss:// stand-in')
+    parser.add_argument('--dials', type=int, default=50)
+    args = parser.parse_args()
+
+    # The plain path can't share a session, so a fresh context per run is fair
+    plain_totals = await plain(args.url, args.ca_file, args.dials)
+    dial_totals, phases, stats = await dialer(args.url, args.ca_file, args.dials)
+
+    print(f"{'phase (dialer)':16} {'p50 ms':>8}")
+    for name, values in phases.items():
+        if values:
+            print(f"{name:16} {statistics.median(values) * 1000:>8.2f}")
+    print(f"\n{'to setupComplete':16} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, values in (('websockets', plain_totals), ('dialer', dial_totals)):
+        print(f"{name:16} {statistics.median(values) * 1000:>8.2f} {percentile(values, 0.95) * 1000:>8.2f}")
+    print(f"\n{stats}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Relay micro-benchmark.
+
+Drives proxy.relay() with in-memory client and upstream sockets to measure
+the relay's own cost, without network or Gemini quota:
+  - per-frame forwarding latency in each direction
+  - CPU used by idle sessions (no audio flowing)
+
+Usage:
+  python bench_relay.py [--frames 2000] [--idle-sessions 1000] [--idle-seconds 5]
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import time
+
+from app import Session
+from framing import AUDIO_FORMAT_JSON, AUDIO_FORMAT_PCM16
+from proxy import relay
+
+
+class MemorySocket:
+    """One end of an in-memory socket that records when frames arrive."""
+
+    def __init__(self):
+        self.inbox = asyncio.Queue()
+        self.arrivals = []
+
+    # Client interface (receive/send/close)
+    async def receive(self, timeout=None):
+        return await self.inbox.get()
+
+    async def send(self, data):
+        self.arrivals.append(time.perf_counter())
+
+    async def close(self):
+        pass
+
+    # Upstream interface (send/recv/async iteration)
+    async def recv(self):
+        return await self.inbox.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        data = await self.inbox.get()
+        if data is None:
+            raise StopAsyncIteration
+        return data
+
+
+def bench_session(audio_format=AUDIO_FORMAT_JSON):
+    session = Session('bench', max_duration=3600)
+    session.audio_format = audio_format
+    return session
+
+
+def audio_frame(samples):
+    data = base64.b64encode(bytes(samples * 2)).decode()
+    return json.dumps({'realtimeInput': {'mediaChunks': [{'mimeType': 'audio/pcm', 'data': data}]}})
+
+
+def model_audio_frame(samples):
+    data = base64.b64encode(bytes(samples * 2)).decode()
+    return json.dumps({'serverContent': {'modelTurn': {'parts': [
+        {'inlineData': {'mimeType': 'audio/pcm;rate=24000', 'data': data}}
+    ]}}})
+
+
+async def measure_latency(frames, gap, audio_format):
+    """Push frames through both legs and return latencies in microseconds."""
+    client, upstream = MemorySocket(), MemorySocket()
+    task = asyncio.create_task(relay(client, upstream, bench_session(audio_format)))
+    if audio_format == AUDIO_FORMAT_PCM16:
+        frame = bytes(4096 * 2)
+    else:
+        frame = audio_frame(4096)
+    reply = model_audio_frame(6144)
+
+    up, down = [], []
+    for _ in range(frames):
+        sent = time.perf_counter()
+        client.inbox.put_nowait(frame)
+        while len(upstream.arrivals) <= len(up):
+            await asyncio.sleep(0)
+        up.append((upstream.arrivals[-1] - sent) * 1e6)
+
+        sent = time.perf_counter()
+        upstream.inbox.put_nowait(reply)
+        while len(client.arrivals) <= len(down):
+            await asyncio.sleep(0)
+        down.append((client.arrivals[-1] - sent) * 1e6)
+
+        if gap:
+            await asyncio.sleep(gap)
+
+    client.inbox.put_nowait(None)
+    await task
+    return up, down
+
+
+async def measure_idle(sessions, seconds):
+    """Return CPU seconds per session per second for idle relays."""
+    pairs = [(MemorySocket(), MemorySocket()) for _ in range(sessions)]
+    tasks = [asyncio.create_task(relay(c, u, bench_session())) for c, u in pairs]
+    await asyncio.sleep(0.5)  # let every relay reach its idle wait
+
+    cpu_start = time.process_time()
+    await asyncio.sleep(seconds)
+    cpu_used = time.process_time() - cpu_start
+
+    for client, _ in pairs:
+        client.inbox.put_nowait(None)
+    await asyncio.gather(*tasks)
+    return cpu_used / sessions / seconds
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames', type=int, default=2000)
+    parser.add_argument('--gap', type=float, default=0.0, help='seconds between frames')
+    parser.add_argument('--idle-sessions', type=int, default=1000)
+    parser.add_argument('--idle-seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    for audio_format in (AUDIO_FORMAT_JSON, AUDIO_FORMAT_PCM16):
+        up, down = await measure_latency(args.frames, args.gap, audio_format)
+        print(f"Forwarding latency over {args.frames} frames, {audio_format} client leg "
+              f"(4096-sample chunks up, 6144 down):")
+        for name, values in (('client -> gemini', up), ('gemini -> client', down)):
+            print(f"  {name}: p50 {statistics.median(values):.0f} us, "
+                  f"p99 {pct(values, 99):.0f} us, max {max(values):.0f} us")
+
+    idle = await measure_idle(args.idle_sessions, args.idle_seconds)
+    print(f"\nIdle CPU with {args.idle_sessions} sessions over {args.idle_seconds:.0f}s:")
+    print(f"  {idle * 1e6:.1f} us CPU per session per second ({idle * 100:.5f}% of a core)")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Resampler CPU benchmark.
+
+Runs resample.Resampler over synthetic speech-band noise for the rate
+pairs the proxy uses and reports the CPU cost per stream: microseconds
+per chunk, percent of one core for one real-time stream, and how many
+real-time streams one core can carry.
+
+Usage:
+  python bench_resample.py [--seconds 20]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from framing import RECEIVE_SAMPLE_RATE, SEND_SAMPLE_RATE
+from resample import Resampler
+
+# (rate in, rate out, chunk ms): browser capture to Gemini, Gemini to playback
+CASES = (
+    (48000, SEND_SAMPLE_RATE, 20),
+    (48000, SEND_SAMPLE_RATE, 85),  # 4096-sample ScriptProcessor blocks
+    (44100, SEND_SAMPLE_RATE, 20),
+    (44100, SEND_SAMPLE_RATE, 93),
+    (RECEIVE_SAMPLE_RATE, 48000, 40),
+    (RECEIVE_SAMPLE_RATE, 44100, 40),
+)
+
+
+def measure(rate_in, rate_out, chunk_ms, seconds):
+    """CPU seconds per second of audio, and per chunk."""
+    rng = np.random.default_rng(0)
+    samples = rate_in * chunk_ms // 1000
+    chunks = [(rng.standard_normal(samples) * 3000).astype('<i2').tobytes() for _ in range(50)]
+    resampler = Resampler(rate_in, rate_out)
+    for chunk in chunks:
+        resampler.process(chunk)
+    count = int(seconds * 1000 / chunk_ms)
+    started = time.thread_time()
+    for i in range(count):
+        resampler.process(chunks[i % len(chunks)])
+    cpu = time.thread_time() - started
+    return cpu / (count * chunk_ms / 1000), cpu / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=20.0, help='audio per case')
+    args = parser.parse_args()
+
+    print(f"{'rates':>16} {'chunk':>7} {'us/chunk':>9} {'core/stream':>12} {'streams/core':>13}")
+    for rate_in, rate_out, chunk_ms in CASES:
+        per_second, per_chunk = measure(rate_in, rate_out, chunk_ms, args.seconds)
+        print(f"{rate_in:>6} -> {rate_out:<6} {chunk_ms:>4} ms {per_chunk * 1e6:>9.1f} "
+              f"{per_second * 100:>11.3f}% {1 / per_second:>13.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Custom word-list store benchmark.
+
+Fills a scratch SQLite file with synthetic families, each with a few
+custom lists, then times the store calls behind the word-list endpoints:
+a list page and a family's lists on a response cache hit and miss, the
+session-start lookup, and prefix search.
+
+Usage:
+  python bench_wordlists.py [--families 20000] [--lists 2] [--words 20]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from prompts import WORD_LISTS
+from wordlists import WordListStore
+
+SYLLABLES = ('ba', 'ko', 'mi', 'ta', 'lu', 'ne', 'po', 'ri', 'sa', 'du', 'ña', 'zé')
+
+
+def fake_word(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))).capitalize()
+
+
+def percentiles(func, calls):
+    times = []
+    for args in calls:
+        started = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - started)
+    times.sort()
+    return times[len(times) // 2] * 1e6, times[int(len(times) * 0.99)] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--families', type=int, default=20000)
+    parser.add_argument('--lists', type=int, default=2, help='custom lists per family')
+    parser.add_argument('--words', type=int, default=20, help='words per list')
+    parser.add_argument('--calls', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = WordListStore(Path(tmp) / 'bench.db', WORD_LISTS, cache_size=args.calls * 2)
+        started = time.perf_counter()
+        for f in range(args.families):
+            for c in range(args.lists):
+                words = [(fake_word(rng), 'pets') for _ in range(args.words)]
+                store.put(f'family-{f}', f'list-{c}', words)
+        print(f"{args.families * args.lists} lists, {args.families * args.lists * args.words} words "
+              f"stored in {time.perf_counter() - started:.1f}s\n")
+
+        def family_calls():
+            return [(f'family-{rng.randrange(args.families)}',) for _ in range(args.calls)]
+
+        pages = [f + (f'list-{rng.randrange(args.lists)}', 0, 50) for f in family_calls()]
+        searches = [f + (rng.choice(SYLLABLES), 0, 50) for f in family_calls()]
+        lists = [f + (0, 100) for f in family_calls()]
+        cases = (
+            ('page, miss', store.page, pages),
+            ('page, hit', store.page, pages),
+            ('page, built-in', store.page, [(f[0], 'animals', 0, 50) for f in pages]),
+            ('lists, miss', store.lists, lists),
+            ('lists, hit', store.lists, lists),
+            ('search, miss', store.search, searches),
+            ('search, hit', store.search, searches),
+            ('session words', store.words, [p[:2] for p in pages]),
+        )
+        print(f"{'':16} {'p50 us':>8} {'p99 us':>8}")
+        for name, func, calls in cases:
+            p50, p99 = percentiles(func, calls)
+            print(f"{name:16} {p50:>8.1f} {p99:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+G.711 mu-law for the client <-> proxy leg.
+
+With "audioFormat": "mulaw" the client sends and receives binary frames
+of 8-bit mu-law instead of 16-bit PCM, half the bytes at the same sample
+rate. The proxy decodes client audio to Int16 before anything else sees
+it and encodes model audio just before queueing it for the client;
+Gemini still gets and sends PCM.
+
+Both directions are one NumPy table lookup: decoding indexes a 256-entry
+table, encoding a 64 Ki-entry table by the sample's 16-bit pattern.
+"""
+
+import numpy as np
+
+BIAS = 0x84
+CLIP = 32635  # largest magnitude before the bias pushes it out of range
+
+
+def _decode_table():
+    code = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (code >> 4) & 0x07
+    mantissa = code & 0x0F
+    magnitude = (((mantissa << 3) + BIAS) << exponent) - BIAS
+    return np.where(code & 0x80, -magnitude, magnitude).astype('<i2')
+
+
+def _encode_table():
+    # The G.711 reference works on 14-bit magnitudes, rounding negatives down
+    samples = np.arange(65536, dtype=np.int32)
+    samples = np.where(samples >= 32768, samples - 65536, samples) >> 2
+    mask = np.where(samples < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(samples), CLIP >> 2) + (BIAS >> 2)
+    # Segment from the highest set bit (magnitude is 33..8192)
+    segment = np.floor(np.log2(magnitude)).astype(np.int32) - 5
+    code = (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F)
+    code = np.where(segment >= 8, 0x7F, code)
+    return (code ^ mask).astype(np.uint8)
+
+
+DECODE = _decode_table()
+ENCODE = _encode_table()
+
+
+def mulaw_decode(data):
+    """Int16 PCM bytes for mu-law bytes."""
+    return DECODE[np.frombuffer(data, dtype=np.uint8)].tobytes()
+
+
+def mulaw_encode(pcm):
+    """Mu-law bytes for Int16 PCM bytes."""
+    return ENCODE[np.frombuffer(pcm, dtype='<u2', count=len(pcm) // 2)].tobytes()
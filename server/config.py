@@ -0,0 +1,97 @@
+"""
+TinyTalk - shared server configuration.
+Loads .env and exposes settings used by both the Flask and asyncio servers.
+"""
+
+import os
+from pathlib import Path
+
+# Load .env file
+try:
+    from dotenv import load_dotenv
+    env_file = Path(__file__).parent.parent / '.env'
+    if env_file.exists():
+        load_dotenv(env_file)
+except ImportError:
+    pass
+
+API_KEY = os.environ.get('GOOGLE_API_KEY', '')
+DATA_DIR = Path(os.environ.get('DATA_DIR', Path(__file__).parent.parent / 'data'))
+MODEL = 'gemini-2.5-flash-native-audio-preview-12-2025'
+VOICES = ['Aoede', 'Leda', 'Puck']  # Child-appropriate voices
+DEFAULT_VOICE = 'Aoede'
+MAX_SESSION_DURATION = 600  # 10 minutes default
+SESSION_DURATION_LIMIT = float(os.environ.get('SESSION_DURATION_LIMIT', '3600'))  # cap on client maxDuration
+MAX_LIVE_SESSIONS = int(os.environ.get('MAX_LIVE_SESSIONS', '5000'))
+
+# Upstream Live API endpoint. Override GEMINI_URL to point the proxy at a
+# local stand-in (see mock_gemini.py); "{key}" is replaced with API_KEY.
+GEMINI_URL = os.environ.get(
+    'GEMINI_URL',
+    'wss://generativelanguage.googleapis.com/ws/google.ai.generativelanguage.v1alpha.GenerativeService.BidiGenerateContent?key={key}',
+)
+
+# Upstream dialing (dial.py): resolved addresses are reused for
+# DNS_CACHE_TTL seconds (0 = look up every dial), TCP connects time out
+# after UPSTREAM_CONNECT_TIMEOUT seconds, and UPSTREAM_CA_FILE, if set, is
+# the CA bundle to verify the upstream against instead of the system one
+# (e.g. the certificate of mock_gemini.py --tls-cert).
+DNS_CACHE_TTL = float(os.environ.get('DNS_CACHE_TTL', '60'))
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', '5'))
+UPSTREAM_CA_FILE = os.environ.get('UPSTREAM_CA_FILE') or None
+
+# Pre-warmed upstream pool (asyncio server only). POOL_WARM_SIZE connections
+# are kept set up for a small base set, plus whatever (voice, mode, prompt)
+# children used recently; 0 disables the pool.
+POOL_WARM_SIZE = int(os.environ.get('POOL_WARM_SIZE', '0'))
+POOL_MAX_SIZE = int(os.environ.get('POOL_MAX_SIZE', str(POOL_WARM_SIZE * 4)))
+POOL_MAX_IDLE = float(os.environ.get('POOL_MAX_IDLE', '240'))  # seconds
+
+# Server-side voice activity detection on client audio: off, drop or thin.
+# Clients can override per session with "vad" in their config message.
+VAD_MODE = os.environ.get('VAD_MODE', 'off')
+
+# Re-chunk client audio into frames of this many ms before sending upstream
+# (0 = forward as received). Clients can override with "frameMs".
+FRAME_MS = int(os.environ.get('FRAME_MS', '0'))
+
+# Session state (elapsed time, stars, word progress) shared by all workers
+STATE_DB = os.environ.get('STATE_DB', str(DATA_DIR / 'sessions.db'))
+WORKERS = int(os.environ.get('WORKERS', '1'))
+# With WORKERS > 1, each worker's metrics totals, summed by /metrics
+METRICS_DIR = os.environ.get('METRICS_DIR', str(DATA_DIR / 'metrics'))
+
+# Optional JSON file overriding prompts.py text (TODDLER_TEACHER_PROMPT,
+# WORD_TEACHING_PROMPT, CONVERSATION_PROMPT, SONG_PROMPT). Edits to it or
+# to prompts.py are picked up without a restart.
+PROMPTS_FILE = os.environ.get('PROMPTS_FILE')
+
+# Transcript capture: per-session JSONL under TRANSCRIPT_DIR, written by a
+# background thread. TRANSCRIPTS sets the default for sessions whose config
+# doesn't say; clients opt in or out with "transcript": true/false.
+TRANSCRIPTS = os.environ.get('TRANSCRIPTS', 'off') == 'on'
+TRANSCRIPT_DIR = os.environ.get('TRANSCRIPT_DIR', str(DATA_DIR / 'transcripts'))
+TRANSCRIPT_QUEUE = int(os.environ.get('TRANSCRIPT_QUEUE', '10000'))  # events
+
+# Session audio recording ("record": true in the config message). Each leg
+# is buffered in a ring of RECORD_BUFFER_SECONDS of audio between writes.
+RECORDINGS_DIR = os.environ.get('RECORDINGS_DIR', str(DATA_DIR / 'recordings'))
+RECORD_BUFFER_SECONDS = float(os.environ.get('RECORD_BUFFER_SECONDS', '2'))
+
+# Upstream reconnect: attempts to replace a dropped Gemini connection (0 =
+# end the session as before) and seconds of client audio replayed to it.
+RECONNECT_ATTEMPTS = int(os.environ.get('RECONNECT_ATTEMPTS', '3'))
+REPLAY_SECONDS = float(os.environ.get('REPLAY_SECONDS', '3'))
+
+# How far a slow client may fall behind real-time playback before model audio is skipped
+DOWNSTREAM_MAX_LAG_MS = int(os.environ.get('DOWNSTREAM_MAX_LAG_MS', '1000'))
+
+# Pre-rendered audio for GREETINGS, ENCOURAGEMENTS and GOODBYES in every
+# voice, kept under PHRASE_CACHE_DIR up to PHRASE_CACHE_MB (least recently
+# used deleted first). PHRASE_RENDERER is 'gemini', 'stub' (local tones, no
+# network) or 'module:function' returning 24 kHz Int16 PCM for (text, voice).
+# Missing phrases are rendered at startup unless PHRASE_WARM=off.
+PHRASE_CACHE_DIR = os.environ.get('PHRASE_CACHE_DIR', str(DATA_DIR / 'phrases'))
+PHRASE_CACHE_MB = float(os.environ.get('PHRASE_CACHE_MB', '50'))
+PHRASE_RENDERER = os.environ.get('PHRASE_RENDERER', 'gemini')
+PHRASE_WARM = os.environ.get('PHRASE_WARM', 'on') == 'on'
@@ -0,0 +1,131 @@
+"""
+Word curriculum for words mode.
+
+Tracks the current word in a session's word list and decides when to move
+on: after the child has said the word enough times (from Gemini's input
+transcription), after enough model turns without success, or when the
+client asks for the next word. Moving on changes the word in place; the
+proxy injects it into the live upstream session instead of reconnecting.
+"""
+
+import re
+import unicodedata
+
+MAX_HEARD = 500  # characters of the child's speech kept for matching
+
+# Runs of letters in any script, with inner apostrophes ("don't")
+_TOKEN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*")
+
+
+def tokens(text):
+    """Case-folded word tokens of text, with accents composed (NFC)."""
+    return _TOKEN.findall(unicodedata.normalize('NFC', text).casefold())
+
+
+def says(text, word):
+    """Whether text contains word (or its plural) as whole tokens.
+
+    Multi-word entries match as a token sequence.
+
+    >>> says('Niño! niño!', 'niño'), says('I want ice creams', 'Ice cream')
+    (True, True)
+    >>> says('café', 'caf'), says('ice and cream', 'ice cream')
+    (False, False)
+    """
+    target = tokens(word)
+    if not target:
+        return False
+    heard = tokens(text)
+    plural = target[:-1] + [target[-1] + 's']
+    n = len(target)
+    return any(heard[i:i + n] in (target, plural) for i in range(len(heard) - n + 1))
+
+
+class WordCurriculum:
+    """Advance a session through its word list.
+
+    Transcript fragments are joined, so a word split across them counts:
+
+    >>> from types import SimpleNamespace
+    >>> session = SimpleNamespace(word_index=0, current_word=None, stars=0)
+    >>> curriculum = WordCurriculum(session, [('ice cream', 'food'), ('milk', 'food')])
+    >>> [curriculum.heard(text) for text in (' I want i', 'ce cre', 'am!', ' Ice', ' cream')]
+    [False, False, False, False, True]
+    >>> session.stars, curriculum.word
+    (2, 'milk')
+    """
+
+    def __init__(self, session, words, hits_to_advance=2, max_turns=8,
+                 on_change=None, on_progress=None):
+        self.session = session
+        self.words = words
+        self.hits_to_advance = hits_to_advance
+        self.max_turns = max_turns  # model turns before moving on anyway
+        self.on_change = on_change  # on_change(session) after any state change
+        self.on_progress = on_progress  # on_progress(session, 'star' | 'learned', word)
+        self.hits = 0
+        self.turns = 0
+        self._heard = ''  # child's speech since the last star or model turn
+        session.current_word = words[session.word_index % len(words)]
+
+    @property
+    def word(self):
+        return self.session.current_word[0]
+
+    def heard(self, text):
+        """Feed a piece of the child's transcribed speech; returns True on a new word.
+
+        Gemini transcribes in small increments, so pieces are joined until
+        the model's turn ends. Each time the joined speech contains the
+        word (or its plural) earns a star, and matching starts over.
+        """
+        self._heard = (self._heard + text)[-MAX_HEARD:]
+        if not says(self._heard, self.word):
+            return False
+        self._heard = ''
+        self.hits += 1
+        self.session.stars += 1
+        self._progress('star', self.word)
+        if self.hits >= self.hits_to_advance:
+            self._progress('learned', self.word)
+            self.advance()
+            return True
+        self._changed()
+        return False
+
+    def turn_complete(self):
+        """Count a finished model turn; returns True on a new word."""
+        self._heard = ''
+        self.turns += 1
+        if self.turns >= self.max_turns:
+            self.advance()
+            return True
+        return False
+
+    def advance(self):
+        """Move to the next word, wrapping at the end of the list."""
+        session = self.session
+        session.word_index += 1
+        session.current_word = self.words[session.word_index % len(self.words)]
+        self.hits = 0
+        self.turns = 0
+        self._heard = ''
+        self._changed()
+        return session.current_word
+
+    def state(self):
+        word, hint = self.session.current_word
+        return {
+            'word': word,
+            'hint': hint,
+            'wordIndex': self.session.word_index,
+            'stars': self.session.stars,
+        }
+
+    def _progress(self, event, word):
+        if self.on_progress is not None:
+            self.on_progress(self.session, event, word)
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change(self.session)
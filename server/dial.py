@@ -0,0 +1,224 @@
+"""
+Upstream dialing: the DNS, TCP, TLS and websocket steps of reaching Gemini.
+
+Every new upstream session (pool refill, pool miss, reconnect) sits on a
+child's wait, and a plain websockets.connect() resolves the host and runs
+a full TLS handshake each time. UpstreamDialer keeps what it can between
+dials:
+
+- resolved addresses, for dns_ttl seconds; if a refresh fails, the last
+  answer is used, and concurrent dials share one lookup per host;
+- one SSLContext, plus the last TLS session per host, offered on the next
+  handshake so the server can resume it rather than run a full one;
+- socket options, set before connecting: TCP_NODELAY for small audio
+  frames, and keepalives so a silently dead upstream is noticed.
+
+connect() returns the connection with its DNS, TCP, TLS and upgrade
+times; the caller times setupComplete, since it sends the setup.
+"""
+
+import asyncio
+import socket
+import ssl
+import time
+from functools import partial
+from urllib.parse import urlsplit
+
+from websockets.asyncio.client import ClientConnection, connect
+
+KEEPALIVE_IDLE = 30  # seconds idle before the first keepalive probe
+KEEPALIVE_INTERVAL = 10
+KEEPALIVE_COUNT = 3
+
+
+class DialTimings:
+    __slots__ = ('dns', 'tcp', 'tls', 'upgrade', 'dns_cached', 'tls_resumed')
+
+    def __init__(self, dns, tcp, tls, upgrade, dns_cached, tls_resumed):
+        self.dns = dns
+        self.tcp = tcp
+        self.tls = tls  # None for ws:// URLs
+        self.upgrade = upgrade
+        self.dns_cached = dns_cached
+        self.tls_resumed = tls_resumed
+
+
+class _TimedConnection(ClientConnection):
+    """Notes when the transport is ready, i.e. after the TLS handshake."""
+
+    transport_ready = 0.0
+
+    def connection_made(self, transport):
+        self.transport_ready = time.perf_counter()
+        super().connection_made(transport)
+
+
+class _ResumingContext(ssl.SSLContext):
+    """Client SSLContext that offers each host's last session on handshake."""
+
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        if session is None and not server_side:
+            session = self.sessions.get(server_hostname)
+        return super().wrap_bio(incoming, outgoing, server_side, server_hostname, session)
+
+
+def tls_context(cafile=None):
+    """Verifying client context; cafile trusts a local stand-in's certificate."""
+    context = _ResumingContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.sessions = {}
+    if cafile:
+        context.load_verify_locations(cafile)
+    else:
+        context.load_default_certs()
+    return context
+
+
+def tune_socket(sock):
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    # Linux names; macOS has only TCP_KEEPALIVE for the idle time
+    for name, value in (('TCP_KEEPIDLE', KEEPALIVE_IDLE), ('TCP_KEEPINTVL', KEEPALIVE_INTERVAL),
+                        ('TCP_KEEPCNT', KEEPALIVE_COUNT)):
+        if hasattr(socket, name):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+
+
+class DnsCache:
+    """getaddrinfo() answers per (host, port), kept for ttl seconds."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}  # (host, port) -> (expires, addresses)
+        self._lookups = {}  # (host, port) -> lookup task in flight
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.stale = 0
+
+    async def resolve(self, host, port):
+        """(addresses, cached) for a host and port."""
+        key = (host, port)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1], True
+        loop = asyncio.get_running_loop()
+        lookup = self._lookups.get(key)
+        # Tasks can't be shared across event loops (Flask runs one per connection)
+        if lookup is not None and lookup.get_loop() is loop:
+            self.shared += 1
+        else:
+            self.misses += 1
+            lookup = loop.create_task(self._lookup(key, entry))
+            self._lookups[key] = lookup
+            lookup.add_done_callback(partial(self._finished, key))
+        # One waiter giving up mustn't cancel the lookup for the others
+        return await asyncio.shield(lookup)
+
+    def _finished(self, key, task):
+        if self._lookups.get(key) is task:
+            del self._lookups[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every waiter gave up
+
+    async def _lookup(self, key, entry):
+        host, port = key
+        loop = asyncio.get_running_loop()
+        try:
+            addresses = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError:
+            if entry is None:
+                raise
+            # Resolver trouble: an old answer beats failing the session
+            self.stale += 1
+            return entry[1], True
+        if self.ttl > 0:
+            self._entries[key] = (time.monotonic() + self.ttl, addresses)
+        return addresses, False
+
+    def forget(self, host, port):
+        self._entries.pop((host, port), None)
+
+
+class UpstreamDialer:
+    """Opens upstream websockets over cached DNS, tuned sockets and resumed TLS."""
+
+    def __init__(self, dns_ttl=60.0, connect_timeout=5.0, cafile=None):
+        self.dns = DnsCache(dns_ttl)
+        self.connect_timeout = connect_timeout
+        self.context = tls_context(cafile)
+        self.dials = 0
+        self.tls_resumed = 0
+        self.tls_full = 0
+
+    async def connect(self, url, **kwargs):
+        """(websocket, DialTimings) for url; kwargs go to websockets' connect()."""
+        parts = urlsplit(url)
+        secure = parts.scheme == 'wss'
+        host = parts.hostname
+        port = parts.port or (443 if secure else 80)
+        started = time.perf_counter()
+        addresses, dns_cached = await self.dns.resolve(host, port)
+        resolved = time.perf_counter()
+        try:
+            sock = await self._connect_tcp(addresses)
+        except OSError:
+            # The cached addresses may be what's wrong; look up afresh next time
+            self.dns.forget(host, port)
+            raise
+        connected = time.perf_counter()
+        if secure:
+            kwargs.update(ssl=self.context, server_hostname=host)
+        try:
+            ws = await connect(url, sock=sock, create_connection=_TimedConnection, **kwargs)
+        except BaseException:
+            sock.close()
+            raise
+        upgraded = time.perf_counter()
+        self.dials += 1
+
+        tls = resumed = None
+        if secure:
+            ssl_object = ws.transport.get_extra_info('ssl_object')
+            resumed = ssl_object.session_reused
+            if resumed:
+                self.tls_resumed += 1
+            else:
+                self.tls_full += 1
+            # TLS 1.3 tickets arrive after the handshake; by now we've read past them
+            session = ssl_object.session
+            if session is not None and session.has_ticket:
+                self.context.sessions[host] = session
+            tls = ws.transport_ready - connected
+        ready = ws.transport_ready if secure else connected
+        return ws, DialTimings(resolved - started, connected - resolved, tls, upgraded - ready,
+                               dns_cached, resumed)
+
+    async def _connect_tcp(self, addresses):
+        """A connected, tuned socket to the first address that answers."""
+        loop = asyncio.get_running_loop()
+        error = None
+        for family, type_, proto, _, address in addresses:
+            sock = socket.socket(family, type_, proto)
+            try:
+                sock.setblocking(False)
+                tune_socket(sock)
+                await asyncio.wait_for(loop.sock_connect(sock, address), self.connect_timeout)
+                return sock
+            except (OSError, asyncio.TimeoutError) as e:
+                sock.close()
+                error = e
+        if isinstance(error, OSError):
+            raise error
+        raise OSError(f'connect timed out: {error}')
+
+    def stats(self):
+        return {
+            'dials': self.dials,
+            'dnsHits': self.dns.hits,
+            'dnsMisses': self.dns.misses,
+            'dnsShared': self.dns.shared,
+            'dnsStale': self.dns.stale,
+            'tlsResumed': self.tls_resumed,
+            'tlsFull': self.tls_full,
+        }
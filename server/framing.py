@@ -0,0 +1,115 @@
+"""
+Binary PCM framing for the client <-> proxy leg.
+
+In binary mode the client sends raw little-endian Int16 PCM (or mu-law)
+as binary websocket frames and receives model audio the same way;
+everything else (config, control, transcripts) stays JSON text. The proxy does the
+base64/JSON wrapping to and from Gemini.
+"""
+
+import base64
+import json
+
+AUDIO_FORMAT_JSON = 'json'
+AUDIO_FORMAT_PCM16 = 'pcm16'
+AUDIO_FORMAT_MULAW = 'mulaw'  # binary frames of 8-bit mu-law (codec.py)
+AUDIO_FORMATS = (AUDIO_FORMAT_JSON, AUDIO_FORMAT_PCM16, AUDIO_FORMAT_MULAW)
+BINARY_AUDIO_FORMATS = (AUDIO_FORMAT_PCM16, AUDIO_FORMAT_MULAW)
+
+SEND_SAMPLE_RATE = 16000
+RECEIVE_SAMPLE_RATE = 24000
+
+# realtimeInput message split around its base64 payload, so wrapping a
+# frame is one b64encode plus one string join instead of a json.dumps.
+_REALTIME_PREFIX = '{"realtimeInput":{"mediaChunks":[{"mimeType":"audio/pcm;rate=%d","data":"'
+_REALTIME_SUFFIX = '"}]}}'
+
+
+def realtime_audio_message(pcm, rate=SEND_SAMPLE_RATE):
+    """Wrap raw Int16 PCM in a Gemini realtimeInput JSON message."""
+    return ''.join((_REALTIME_PREFIX % rate, base64.b64encode(pcm).decode('ascii'), _REALTIME_SUFFIX))
+
+
+_SERVER_AUDIO_PREFIX = '{"serverContent":{"modelTurn":{"parts":[{"inlineData":{"mimeType":"audio/pcm;rate=%d","data":"'
+_SERVER_AUDIO_SUFFIX = '"}}]}}}'
+
+
+def server_audio_message(pcm, rate):
+    """Wrap model PCM in a Gemini-style serverContent JSON message."""
+    return ''.join((_SERVER_AUDIO_PREFIX % rate, base64.b64encode(pcm).decode('ascii'), _SERVER_AUDIO_SUFFIX))
+
+
+def client_audio(message):
+    """Return the PCM carried by a JSON realtimeInput message, or None.
+
+    Only messages that carry nothing but PCM media chunks are decoded;
+    anything else should be passed through untouched.
+    """
+    if 'mediaChunks' not in message:
+        return None
+    try:
+        msg = json.loads(message)
+        realtime = msg['realtimeInput']
+        chunks = realtime['mediaChunks']
+        if len(msg) != 1 or len(realtime) != 1:
+            return None
+        if not all(c.get('mimeType', '').startswith('audio/pcm') for c in chunks):
+            return None
+        return b''.join(base64.b64decode(c['data']) for c in chunks)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def split_server_message(message):
+    """Split a Gemini message into PCM frames and a JSON remainder.
+
+    Returns (pcm_frames, remainder) where remainder is the message with its
+    audio parts removed, or None if nothing else is left in it.
+    """
+    marker = b'inlineData' if isinstance(message, bytes) else 'inlineData'
+    if marker not in message:
+        return [], message
+    msg = json.loads(message)
+    content = msg.get('serverContent') or {}
+    turn = content.get('modelTurn') or {}
+    parts = turn.get('parts') or []
+
+    frames = []
+    kept = []
+    for part in parts:
+        inline = part.get('inlineData')
+        if inline and inline.get('mimeType', '').startswith('audio/pcm'):
+            frames.append(base64.b64decode(inline['data']))
+        else:
+            kept.append(part)
+
+    if not frames:
+        return [], message
+    if kept:
+        turn['parts'] = kept
+    else:
+        del content['modelTurn']
+    if not content:
+        del msg['serverContent']
+    return frames, (json.dumps(msg) if msg else None)
+
+
+def mentions(message, marker):
+    """Substring test that works on text and binary Gemini frames."""
+    if isinstance(message, (bytes, bytearray)):
+        return marker.encode() in message
+    return marker in message
+
+
+def server_content(message, markers):
+    """Parsed serverContent of a Gemini message that mentions any marker.
+
+    Returns None without parsing when none of the marker strings occur in
+    the raw message, which keeps large audio frames off the JSON parser.
+    """
+    if not any(mentions(message, m) for m in markers):
+        return None
+    try:
+        return json.loads(message).get('serverContent')
+    except (ValueError, AttributeError):
+        return None
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Load-test harness for the TinyTalk /ws proxy.
+
+Drives N synthetic toddler clients through /ws: each sends a config message,
+waits for setupComplete, then streams 16 kHz PCM chunks in real time like
+web/index.html. Reports p50/p99 time-to-setupComplete and first-audio
+latency, frames/s in each direction and server RSS per session.
+
+Point the server at mock_gemini.py to avoid spending quota:
+  python mock_gemini.py &
+  GOOGLE_API_KEY=test GEMINI_URL='ws://localhost:9000/ws?key={key}' python asgi.py &
+  python loadtest.py --clients 200 --duration 20 --server-pid $(pgrep -f asgi.py)
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import time
+
+import websockets
+
+SEND_SAMPLE_RATE = 16000
+CHUNK_SAMPLES = 4096  # ScriptProcessor buffer size in web/index.html
+
+
+class ClientStats:
+    """Timings collected by one synthetic client."""
+
+    def __init__(self):
+        self.setup_time = None
+        self.first_audio = None
+        self.frames_sent = 0
+        self.frames_received = 0
+        self.error = None
+
+
+def rss_kb(pid):
+    """Resident set size of a process in KiB (Linux /proc)."""
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def pct(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run_client(url, index, args, stats, started):
+    chunk_seconds = CHUNK_SAMPLES / SEND_SAMPLE_RATE
+    binary = args.audio_format in ('pcm16', 'mulaw')
+    if args.audio_format == 'mulaw':
+        frame = b'\xff' * CHUNK_SAMPLES  # mu-law silence
+    elif binary:
+        frame = bytes(CHUNK_SAMPLES * 2)
+    else:
+        frame = json.dumps({
+            'realtimeInput': {
+                'mediaChunks': [{
+                    'mimeType': 'audio/pcm',
+                    'data': base64.b64encode(bytes(CHUNK_SAMPLES * 2)).decode(),
+                }]
+            }
+        })
+    config = {
+        'sessionId': f'load-{index}-{time.time()}',
+        'mode': args.mode,
+        'voice': args.voice,
+        'maxDuration': args.duration + 60,
+        'audioFormat': args.audio_format,
+    }
+
+    try:
+        t0 = time.perf_counter()
+        async with websockets.connect(url, max_size=None) as ws:
+            await ws.send(json.dumps(config))
+            while True:
+                msg = json.loads(await ws.recv())
+                if 'setupComplete' in msg:
+                    stats.setup_time = time.perf_counter() - t0
+                    break
+                if 'error' in msg:
+                    raise RuntimeError(msg['error'])
+            started.set()
+
+            first_sent = time.perf_counter()
+
+            async def sender():
+                next_send = time.perf_counter()
+                end = next_send + args.duration
+                while next_send < end:
+                    await ws.send(frame)
+                    stats.frames_sent += 1
+                    next_send += chunk_seconds
+                    await asyncio.sleep(max(0, next_send - time.perf_counter()))
+
+            async def receiver():
+                async for message in ws:
+                    if isinstance(message, bytes) and binary:
+                        is_audio = True
+                    else:
+                        msg = json.loads(message)
+                        parts = msg.get('serverContent', {}).get('modelTurn', {}).get('parts', [])
+                        is_audio = any('inlineData' in p for p in parts)
+                    if is_audio:
+                        stats.frames_received += 1
+                        if stats.first_audio is None:
+                            stats.first_audio = time.perf_counter() - first_sent
+
+            recv_task = asyncio.create_task(receiver())
+            await sender()
+            recv_task.cancel()
+    except Exception as e:
+        stats.error = str(e) or type(e).__name__
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Load-test the TinyTalk /ws proxy')
+    parser.add_argument('--url', default='ws://localhost:5000/ws')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='seconds of audio each client streams')
+    parser.add_argument('--ramp', type=float, default=2.0,
+                        help='seconds over which clients connect')
+    parser.add_argument('--mode', default='conversation')
+    parser.add_argument('--voice', default='Aoede')
+    parser.add_argument('--audio-format', choices=['json', 'pcm16', 'mulaw'], default='json',
+                        help='client-leg audio framing to negotiate')
+    parser.add_argument('--server-pid', type=int,
+                        help='proxy process id, to report RSS per session')
+    args = parser.parse_args()
+
+    rss_before = rss_kb(args.server_pid) if args.server_pid else None
+    stats = [ClientStats() for _ in range(args.clients)]
+    events = [asyncio.Event() for _ in range(args.clients)]
+
+    async def launch(i):
+        await asyncio.sleep(args.ramp * i / max(1, args.clients))
+        await run_client(args.url, i, args, stats[i], events[i])
+
+    t0 = time.perf_counter()
+    tasks = [asyncio.create_task(launch(i)) for i in range(args.clients)]
+
+    # Sample RSS once every client has connected (or failed)
+    rss_peak = None
+    if args.server_pid:
+        await asyncio.wait(
+            [asyncio.create_task(e.wait()) for e in events],
+            timeout=args.ramp + 30,
+        )
+        await asyncio.sleep(1)
+        rss_peak = rss_kb(args.server_pid)
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t0
+
+    ok = [s for s in stats if s.error is None]
+    errors = [s.error for s in stats if s.error is not None]
+    setup = [s.setup_time * 1000 for s in ok if s.setup_time is not None]
+    first = [s.first_audio * 1000 for s in ok if s.first_audio is not None]
+    sent = sum(s.frames_sent for s in stats)
+    received = sum(s.frames_received for s in stats)
+
+    print(f"Clients: {len(ok)} ok, {len(errors)} failed, {elapsed:.1f}s wall")
+    print(f"time-to-setupComplete: p50 {pct(setup, 50):.1f} ms, p99 {pct(setup, 99):.1f} ms")
+    print(f"first-audio latency:   p50 {pct(first, 50):.1f} ms, p99 {pct(first, 99):.1f} ms")
+    print(f"frames/s: {sent / elapsed:.0f} client->proxy, {received / elapsed:.0f} proxy->client")
+    if rss_peak is not None:
+        per_session = (rss_peak - rss_before) / max(1, len(ok))
+        print(f"server RSS: {rss_before / 1024:.1f} MiB idle, {rss_peak / 1024:.1f} MiB loaded, "
+              f"{per_session:.0f} KiB per session")
+    for error in sorted(set(errors))[:5]:
+        print(f"  error: {error} (x{errors.count(error)})")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,343 @@
+"""
+Metrics in Prometheus text format.
+
+Counters and histograms keep one value array per thread, so recording on
+the relay path is a list index update with no lock: all /ws sessions on
+the asyncio server share the event loop thread's array, and each Flask
+thread gets its own. The lock is only taken when a thread records its
+first value and when /metrics adds the arrays up. Arrays of threads that
+have exited are folded into a base array whenever a thread adds one, so
+thread churn doesn't grow memory.
+
+With several worker processes, share(directory) makes each write its
+totals to <directory>/<pid>-<start>.json every few seconds and at exit,
+and render() adds the other workers' files to its own numbers, so any
+worker answers a scrape with the same monotonic totals. Files of exited
+workers keep counting towards counters and histograms; their gauges are
+left out.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+# Seconds; tuned for sub-millisecond relay work up to multi-second setups
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_metrics = []
+_shared = None  # _SharedDir once share() is called
+
+
+class _Sharded:
+    """A fixed-size list of numbers, summed across per-thread copies."""
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []  # (thread, values)
+        self._base = [0] * size
+
+    def _values(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0] * self._size
+            with self._lock:
+                self._fold_locked()
+                self._shards.append((threading.current_thread(), values))
+            self._local.values = values
+            return values
+
+    def _fold_locked(self):
+        live = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                live.append((thread, values))
+            else:
+                self._base = [a + b for a, b in zip(self._base, values)]
+        self._shards = live
+
+    def totals(self):
+        with self._lock:
+            self._fold_locked()
+            totals = list(self._base)
+            for _, values in self._shards:
+                totals = [a + b for a, b in zip(totals, values)]
+        return totals
+
+
+class _CounterValue(_Sharded):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount=1):
+        self._values()[0] += amount
+
+
+class _HistogramValue(_Sharded):
+    """Per-bucket counts followed by the sum of observed values."""
+
+    def __init__(self, buckets):
+        super().__init__(len(buckets) + 2)
+        self.buckets = buckets
+
+    def observe(self, value):
+        values = self._values()
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._children_lock = threading.Lock()
+        _metrics.append(self)
+        if not self.label_names:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        """The series for these label values; resolve once and keep it."""
+        child = self._children.get(values)
+        if child is None:
+            with self._children_lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.label_names, values)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+    def snapshot(self):
+        """{label values: totals} for this process."""
+        return {values: child.totals() for values, child in list(self._children.items())}
+
+    def render(self, series):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for values, totals in sorted(series.items()):
+            lines.extend(self._render_series(values, totals))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _render_series(self, values, totals):
+        yield f'{self.name}{self._label_text(values)} {_number(totals[0])}'
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help_text, labels)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def _render_series(self, values, totals):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), totals[:-1]):
+            cumulative += count
+            le = bound if bound == '+Inf' else _number(bound)
+            yield f'{self.name}_bucket{self._label_text(values, [("le", le)])} {cumulative}'
+        yield f'{self.name}_sum{self._label_text(values)} {_number(totals[-1])}'
+        yield f'{self.name}_count{self._label_text(values)} {cumulative}'
+
+
+class Gauge(_Metric):
+    """A value read from a callback when /metrics is scraped."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, read):
+        self.read = read
+        super().__init__(name, help_text)
+
+    def _new_child(self):
+        return None
+
+    def snapshot(self):
+        return {(): [self.read()]}
+
+    def _render_series(self, values, totals):
+        yield f'{self.name} {_number(totals[0])}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class _SharedDir:
+    """This worker's metrics file, and the sum of every worker's."""
+
+    def __init__(self, directory, interval):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / f'{os.getpid()}-{time.time_ns()}.json'
+        self.interval = interval
+        threading.Thread(target=self._run, name='metrics-share', daemon=True).start()
+        atexit.register(self.write)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Metrics write failed: {e}")
+
+    def write(self, series=None):
+        if series is None:
+            series = _snapshot()
+        data = {
+            'pid': os.getpid(),
+            'metrics': {
+                name: [[list(values), totals] for values, totals in children.items()]
+                for name, children in series.items()
+            },
+        }
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, self.path)
+
+    def others(self):
+        """(alive, {name: {label values: totals}}) for every other worker's file."""
+        for path in self.directory.glob('*.json'):
+            if path == self.path:
+                continue
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue  # replaced or removed as we read it
+            yield _alive(data['pid']), {
+                name: {tuple(values): totals for values, totals in children}
+                for name, children in data['metrics'].items()
+            }
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def share(directory, interval=5.0):
+    """Sum metrics across worker processes through files in directory."""
+    global _shared
+    if _shared is None:
+        _shared = _SharedDir(directory, interval)
+
+
+def _snapshot():
+    return {metric.name: metric.snapshot() for metric in _metrics}
+
+
+def render():
+    """All registered metrics in Prometheus text exposition format."""
+    series = _snapshot()
+    if _shared is not None:
+        _shared.write(series)
+        for alive, other in _shared.others():
+            for metric in _metrics:
+                if metric.kind == 'gauge' and not alive:
+                    continue
+                mine = series[metric.name]
+                for values, totals in other.get(metric.name, {}).items():
+                    if values in mine:
+                        mine[values] = [a + b for a, b in zip(mine[values], totals)]
+                    else:
+                        mine[values] = totals
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render(series[metric.name]))
+    return '\n'.join(lines) + '\n'
+
+
+# Proxy metrics, recorded from proxy.py
+SETUP_SECONDS = Histogram(
+    'tinytalk_setup_seconds',
+    'Time from session start to Gemini setupComplete (including pool hits).',
+)
+RESPONSE_SECONDS = Histogram(
+    'tinytalk_response_seconds',
+    'Time from the end of child speech to the first model audio of the reply.',
+)
+RELAY_SECONDS = Histogram(
+    'tinytalk_relay_seconds',
+    'Time from receiving a frame to finishing its send on the other leg (incl. queueing).',
+    labels=('direction',),
+)
+FRAMES = Counter('tinytalk_frames_total', 'Frames relayed.', labels=('direction',))
+BYTES = Counter('tinytalk_bytes_total', 'Bytes received for relaying.', labels=('direction',))
+UPSTREAM_ERRORS = Counter(
+    'tinytalk_upstream_errors_total', 'Gemini connection failures.', labels=('stage',),
+)
+UPSTREAM_DIAL_SECONDS = Histogram(
+    'tinytalk_upstream_dial_seconds',
+    'Time spent in each phase of opening a Gemini connection (dns, tcp, tls, upgrade, setup).',
+    labels=('phase',),
+)
+UPSTREAM_TLS_HANDSHAKES = Counter(
+    'tinytalk_upstream_tls_handshakes_total', 'TLS handshakes to Gemini, by whether a session was resumed.',
+    labels=('resumed',),
+)
+RECONNECTS = Counter(
+    'tinytalk_upstream_reconnects_total', 'Dropped Gemini connections replaced mid-session.',
+)
+RECONNECT_GAP_SECONDS = Histogram(
+    'tinytalk_reconnect_gap_seconds',
+    'Time from losing Gemini to the replacement connection being ready.',
+)
+DOWNSTREAM_QUEUED_SECONDS = Histogram(
+    'tinytalk_downstream_queued_seconds',
+    'Model audio waiting in a session\'s outbound queue, sampled per audio frame.',
+)
+DOWNSTREAM_DROPPED = Counter(
+    'tinytalk_downstream_dropped_frames_total', 'Stale model audio frames dropped for slow clients.',
+)
+SLOW_CLIENT_DISCONNECTS = Counter(
+    'tinytalk_slow_client_disconnects_total', 'Sessions ended because the client stopped reading.',
+)
+RESAMPLE_CPU_SECONDS = Counter(
+    'tinytalk_resample_cpu_seconds_total', 'Thread CPU time spent resampling client-leg audio.',
+    labels=('direction',),
+)
+RESAMPLE_AUDIO_SECONDS = Counter(
+    'tinytalk_resample_audio_seconds_total', 'Duration of the audio resampled.', labels=('direction',),
+)
+SESSIONS = Counter('tinytalk_sessions_total', 'Proxy sessions started.')
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Gemini Live BidiGenerateContent websocket.
+
+Answers `setup` with `setupComplete`, then streams a synthetic model turn
+(24 kHz 16-bit PCM tone as `inlineData`, plus an output transcription and
+`turnComplete`) after every few client audio chunks or any `clientContent`.
+With --input-transcript it also reports that text as the child's speech,
+and --drop-after aborts connections mid-session to exercise reconnects.
+With --tls-cert/--tls-key it serves wss:// like the real endpoint, so the
+proxy's DNS, TLS and session-resumption path can be exercised too.
+Lets the proxy be load-tested without spending API quota.
+
+Usage:
+  python mock_gemini.py [--port 9000] [--setup-delay 0.3] [--turn-every 8]
+  GEMINI_URL='ws://localhost:9000/ws?key={key}' python asgi.py
+
+  openssl req -x509 -newkey rsa:2048 -nodes -days 30 -subj /CN=localhost \
+      -addext subjectAltName=DNS:localhost -keyout mock.key -out mock.crt
+  python mock_gemini.py --tls-cert mock.crt --tls-key mock.key
+  GEMINI_URL='wss://localhost:9000/ws?key={key}' UPSTREAM_CA_FILE=mock.crt python asgi.py
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import ssl
+from array import array
+
+import websockets
+
+RECEIVE_SAMPLE_RATE = 24000
+
+
+def tone_chunk(ms, freq=440.0, rate=RECEIVE_SAMPLE_RATE):
+    """Base64 of one chunk of a sine tone as little-endian Int16 PCM."""
+    n = rate * ms // 1000
+    samples = array('h', (int(8000 * math.sin(2 * math.pi * freq * i / rate)) for i in range(n)))
+    return base64.b64encode(samples.tobytes()).decode()
+
+
+class MockGemini:
+    """Per-process mock settings and the pre-serialized reply frames."""
+
+    def __init__(self, setup_delay, turn_every, turn_seconds, chunk_ms, realtime,
+                 input_transcript='', drop_after=0.0):
+        self.setup_delay = setup_delay
+        self.drop_after = drop_after
+        self.turn_every = turn_every
+        self.chunk_ms = chunk_ms
+        self.realtime = realtime
+        self.chunks_per_turn = max(1, int(turn_seconds * 1000 / chunk_ms))
+        self.audio_frame = json.dumps({
+            'serverContent': {
+                'modelTurn': {
+                    'parts': [{
+                        'inlineData': {
+                            'mimeType': f'audio/pcm;rate={RECEIVE_SAMPLE_RATE}',
+                            'data': tone_chunk(chunk_ms),
+                        }
+                    }]
+                }
+            }
+        })
+        self.transcript_frame = json.dumps({
+            'serverContent': {'outputTranscription': {'text': 'Wow, great try!'}}
+        })
+        self.turn_complete_frame = json.dumps({'serverContent': {'turnComplete': True}})
+        self.input_frame = json.dumps({
+            'serverContent': {'inputTranscription': {'text': input_transcript}}
+        }) if input_transcript else None
+        self.connections = 0
+
+    async def model_turn(self, ws, heard):
+        if heard and self.input_frame:
+            await ws.send(self.input_frame)
+        await ws.send(self.transcript_frame)
+        for _ in range(self.chunks_per_turn):
+            await ws.send(self.audio_frame)
+            if self.realtime:
+                await asyncio.sleep(self.chunk_ms / 1000)
+        await ws.send(self.turn_complete_frame)
+
+    async def handler(self, ws):
+        self.connections += 1
+        turn = None
+        try:
+            setup = json.loads(await ws.recv())
+            if 'setup' not in setup:
+                await ws.close(1007, 'expected setup')
+                return
+            if self.setup_delay:
+                await asyncio.sleep(self.setup_delay)
+            await ws.send(json.dumps({'setupComplete': {}}))
+            if self.drop_after:
+                # Simulate the upstream dropping mid-session
+                asyncio.get_running_loop().call_later(self.drop_after, ws.transport.abort)
+
+            audio_chunks = 0
+            async for message in ws:
+                msg = json.loads(message)
+                start_turn = heard = False
+                if 'realtimeInput' in msg:
+                    audio_chunks += 1
+                    start_turn = heard = self.turn_every and audio_chunks % self.turn_every == 0
+                elif 'clientContent' in msg:
+                    start_turn = True
+                if start_turn and (turn is None or turn.done()):
+                    turn = asyncio.create_task(self.model_turn(ws, heard))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if turn is not None:
+                turn.cancel()
+            self.connections -= 1
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Local Gemini Live stand-in')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--setup-delay', type=float, default=0.0,
+                        help='seconds to wait before setupComplete')
+    parser.add_argument('--turn-every', type=int, default=8,
+                        help='client audio chunks per model turn (0 = never)')
+    parser.add_argument('--turn-seconds', type=float, default=1.5,
+                        help='audio length of each model turn')
+    parser.add_argument('--chunk-ms', type=int, default=40,
+                        help='duration of each inlineData chunk')
+    parser.add_argument('--input-transcript', default='',
+                        help='inputTranscription text to report before each turn')
+    parser.add_argument('--drop-after', type=float, default=0.0,
+                        help='abort each connection this many seconds after setup')
+    parser.add_argument('--fast', action='store_true',
+                        help='send turns as fast as possible instead of real time')
+    parser.add_argument('--tls-cert', help='PEM certificate: serve wss:// instead of ws://')
+    parser.add_argument('--tls-key', help='PEM private key for --tls-cert')
+    args = parser.parse_args()
+
+    context = None
+    if args.tls_cert:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(args.tls_cert, args.tls_key)
+
+    mock = MockGemini(args.setup_delay, args.turn_every, args.turn_seconds,
+                      args.chunk_ms, realtime=not args.fast,
+                      input_transcript=args.input_transcript,
+                      drop_after=args.drop_after)
+    async with websockets.serve(mock.handler, args.host, args.port, max_size=None, ssl=context):
+        scheme = 'wss' if context else 'ws'
+        print(f"Mock Gemini Live listening on {scheme}://{args.host}:{args.port}/ws")
+        await asyncio.Future()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,166 @@
+"""
+Bounded per-session queue for messages to the client.
+
+The Gemini reader puts messages here instead of awaiting the client
+socket, and a writer task sends them. A slow client then doesn't stall
+the upstream reader, and the queue can't grow without limit:
+
+- Control messages (JSON other than model audio) are never dropped. If
+  more than `max_control` of them pile up, put() reports overflow and the
+  session should end, because the client has stopped reading.
+- Model audio is dropped once the client is more than `max_lag_ms`
+  behind real-time playback. Each frame is due when the client would
+  start playing it: the reply's first frame when it's queued, the rest
+  back to back after it. A frame still queued `max_lag_ms` after it was
+  due is dropped, on put or when the writer comes for it. Gemini sends
+  replies faster than real time, so a lot of audio can be queued; none
+  of it is late while the writer keeps sending it before it's due.
+- When Gemini reports the child interrupted the model, queued audio is
+  discarded at once, because it belongs to the reply being cut off.
+- With binary audio (pcm16 or mulaw), consecutive frames are joined into
+  one websocket message (up to `coalesce_ms`) when the writer is behind.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+PCM_BYTES_PER_MS = 48  # 24 kHz Int16 model audio
+
+
+class OutboundQueue:
+    """Client-bound messages with a lag limit on audio; see module docstring.
+
+    A 3 s reply that arrives in 74 ms, then one message per send:
+
+    >>> async def reply(send_ms):
+    ...     now = [0.0]
+    ...     queue = OutboundQueue(max_lag_ms=1000, clock=lambda: now[0])
+    ...     for _ in range(74):
+    ...         queue.put_audio(b'', 40, now[0])
+    ...         now[0] += 0.001
+    ...     queue.put('turnComplete', now[0])
+    ...     received = 0
+    ...     while (await queue.get())[0] != 'turnComplete':
+    ...         now[0] += send_ms / 1000
+    ...         received += 1
+    ...     return received, queue.dropped
+    >>> asyncio.run(reply(send_ms=5))  # keeps up: nothing lost
+    (74, 0)
+    >>> asyncio.run(reply(send_ms=80))  # half speed: skips what it's too late for
+    (49, 25)
+    """
+
+    def __init__(self, max_lag_ms=1000, max_control=1000, coalesce_ms=0, clock=time.perf_counter):
+        self.max_lag_ms = max_lag_ms
+        self.max_control = max_control
+        self.coalesce_ms = coalesce_ms  # 0 = never join (audio isn't raw PCM)
+        self.clock = clock
+        self._items = deque()  # (audio_ms or None, message, enqueued_at, due)
+        self._play_end = 0.0  # when the audio queued so far would finish playing
+        self._ready = asyncio.Event()
+        self.audio_ms = 0.0  # audio currently queued
+        self.control = 0  # control messages currently queued
+        self.peak_ms = 0.0
+        self.dropped = 0
+        self.dropped_ms = 0.0
+
+    def put(self, message, now):
+        """Queue a control message; False if the client is hopelessly behind."""
+        if self.control >= self.max_control:
+            return False
+        self._items.append((None, message, now, None))
+        self.control += 1
+        self._ready.set()
+        return True
+
+    def put_audio(self, message, audio_ms, now):
+        """Queue model audio, dropping queued audio the client is too late for."""
+        # After a pause the client starts playing afresh; otherwise back to back
+        due = max(now, self._play_end)
+        self._play_end = due + audio_ms / 1000
+        self._items.append((audio_ms, message, now, due))
+        self.audio_ms += audio_ms
+        self._drop_late(now)
+        if self.audio_ms > self.peak_ms:
+            self.peak_ms = self.audio_ms
+        self._ready.set()
+
+    def interrupt(self):
+        """Discard all queued audio (the reply it belongs to was cut off)."""
+        self._play_end = 0.0
+        if self.audio_ms:
+            self._drop_audio(lambda due: True)
+
+    def _drop_late(self, now):
+        deadline = now - self.max_lag_ms / 1000
+        for item in self._items:
+            if item[3] is not None:
+                # Audio is due in order, so the oldest tells
+                if item[3] < deadline:
+                    self._drop_audio(lambda due: due < deadline)
+                return
+
+    def _drop_audio(self, late):
+        kept = deque()
+        for item in self._items:
+            audio_ms, _, _, due = item
+            if audio_ms is not None and late(due):
+                self.audio_ms -= audio_ms
+                self.dropped += 1
+                self.dropped_ms += audio_ms
+            else:
+                kept.append(item)
+        self._items = kept
+
+    async def get(self):
+        """Next (message, enqueued_at) to send, joining PCM frames if behind."""
+        while True:
+            while not self._items:
+                self._ready.clear()
+                await self._ready.wait()
+            if self.audio_ms:
+                self._drop_late(self.clock())
+            if self._items:
+                break
+        audio_ms, message, enqueued_at, _ = self._items.popleft()
+        if audio_ms is None:
+            self.control -= 1
+            return message, enqueued_at
+        self.audio_ms -= audio_ms
+        if not self.coalesce_ms or not self._items:
+            return message, enqueued_at
+        # Behind: send queued PCM as one frame instead of many small ones
+        parts = [message]
+        joined_ms = audio_ms
+        while self._items and joined_ms < self.coalesce_ms:
+            next_ms, next_message, _, _ = self._items[0]
+            if next_ms is None:
+                break
+            self._items.popleft()
+            self.audio_ms -= next_ms
+            joined_ms += next_ms
+            parts.append(next_message)
+        if len(parts) == 1:
+            return message, enqueued_at
+        return b''.join(parts), enqueued_at
+
+    def stats(self):
+        return {
+            'queuedMs': round(self.audio_ms),
+            'queuedControl': self.control,
+            'peakMs': round(self.peak_ms),
+            'droppedFrames': self.dropped,
+            'droppedMs': round(self.dropped_ms),
+        }
+
+
+def pcm_ms(pcm):
+    """Duration of raw model PCM."""
+    return len(pcm) / PCM_BYTES_PER_MS
+
+
+def json_audio_ms(message):
+    """Approximate duration of the base64 model audio in a JSON message."""
+    # 4 characters per 3 bytes; the JSON wrapper around it is noise
+    return len(message) * 3 / 4 / PCM_BYTES_PER_MS
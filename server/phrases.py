@@ -0,0 +1,332 @@
+"""
+Pre-rendered audio for the canned phrases (greetings, encouragements,
+goodbyes).
+
+Each (text, voice) pair is rendered once to 24 kHz Int16 PCM and kept in
+<directory>/<key>.pcm, where key is a hash of voice and text. Endpoints
+and the relay read phrases from disk instead of asking Gemini to say them
+again; a miss starts a background render and never waits for it. Worker
+processes share the directory, and a <key>.lock file created with O_EXCL
+makes sure only one of them renders a phrase at a time; the others wait
+for its file. The directory is bounded: least recently used phrases are deleted
+once it grows past max_bytes, and file modification times carry the
+recency across restarts.
+
+Rendering goes through a pluggable function render(text, voice) -> PCM:
+GeminiRenderer asks a Live session in that voice to say the line,
+stub_renderer makes local tones for development, and any
+'module:function' can be configured instead.
+"""
+
+import hashlib
+import importlib
+import io
+import json
+import os
+import threading
+import time
+import wave
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from framing import RECEIVE_SAMPLE_RATE, mentions, split_server_message
+import prompts
+from setup_cache import build_setup_message
+
+WARM_MAX_FAILURES = 3  # consecutive render failures before warm-up gives up
+RENDER_LOCK_STALE = 120  # seconds before another process's render lock is presumed dead
+RENDER_LOCK_POLL = 0.25
+
+
+def phrase_key(text, voice):
+    return hashlib.sha256(f'{voice}\n{text}'.encode()).hexdigest()[:32]
+
+
+def wav_bytes(pcm, rate=RECEIVE_SAMPLE_RATE):
+    """PCM wrapped in a WAV header, for <audio> elements."""
+    out = io.BytesIO()
+    with wave.open(out, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm)
+    return out.getvalue()
+
+
+class PhraseCache:
+    """Disk-backed LRU of rendered phrase audio; see module docstring."""
+
+    def __init__(self, directory, render, max_bytes):
+        self.directory = Path(directory)
+        self.render = render
+        self.max_bytes = max_bytes
+        self.phrases = {}  # key -> (text, voice) that may be requested
+        self._index = OrderedDict()  # key -> size on disk, least recently used first
+        self._bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._render_locks = {}  # key -> lock held while that phrase renders
+        self._warm_thread = None
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def register(self, texts, voices):
+        """Set the phrases that can be looked up by key and warmed.
+
+        Replaces the previous set, so a prompts.py reload drops old lines;
+        their audio stays on disk until it's evicted.
+        """
+        self.phrases = {phrase_key(text, voice): (text, voice) for text in texts for voice in voices}
+
+    def _path(self, key):
+        return self.directory / f'{key}.pcm'
+
+    def _load(self):
+        # Called with the lock held
+        if self._loaded:
+            return
+        self._loaded = True
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for path in self.directory.glob('*.pcm'):
+            stat = path.stat()
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+
+    def get(self, text, voice, render=True):
+        """PCM for a phrase, or None on a miss, which starts a background render."""
+        return self.get_key(phrase_key(text, voice), text, voice, render)
+
+    def get_key(self, key, text=None, voice=None, render=True):
+        if text is None:
+            if key not in self.phrases:
+                return None
+            text, voice = self.phrases[key]
+        pcm = self._read(key)
+        with self._lock:
+            if pcm is not None:
+                self.hits += 1
+                return pcm
+            self.misses += 1
+            if not render or key in self._render_locks:
+                return None
+            # Claimed here so concurrent misses start one thread
+            self._render_locks[key] = threading.Lock()
+        threading.Thread(target=self._render, args=(key, text, voice), name='phrase-render',
+                         daemon=True).start()
+        return None
+
+    def _read(self, key):
+        path = self._path(key)
+        with self._lock:
+            self._load()
+            if key not in self._index:
+                # Another worker process may have rendered it since we loaded
+                try:
+                    size = path.stat().st_size
+                except FileNotFoundError:
+                    return None
+                self._index[key] = size
+                self._bytes += size
+            self._index.move_to_end(key)
+        try:
+            pcm = path.read_bytes()
+            os.utime(path)  # recency survives a restart
+            return pcm
+        except FileNotFoundError:
+            # Deleted behind our back (or by another worker's eviction)
+            with self._lock:
+                self._bytes -= self._index.pop(key, 0)
+            return None
+
+    def _render(self, key, text, voice):
+        with self._lock:
+            lock = self._render_locks.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                deadline = time.monotonic() + RENDER_LOCK_STALE
+                while True:
+                    # Another thread or process may have rendered it while we waited
+                    pcm = self._read(key)
+                    if pcm is not None:
+                        return pcm
+                    if self._claim(key):
+                        break
+                    if time.monotonic() > deadline:
+                        return None
+                    time.sleep(RENDER_LOCK_POLL)
+                try:
+                    pcm = self._read(key)  # finished just before we claimed it
+                    if pcm is not None:
+                        return pcm
+                    try:
+                        pcm = self.render(text, voice)
+                    except Exception as e:
+                        with self._lock:
+                            self.errors += 1
+                        print(f"Phrase render failed ({voice}: {text!r}): {e}")
+                        return None
+                    # Stored before the locks go, so a later caller finds it on disk
+                    self._store(key, pcm)
+                    return pcm
+                finally:
+                    self._lock_path(key).unlink(missing_ok=True)
+        finally:
+            with self._lock:
+                if self._render_locks.get(key) is lock:
+                    del self._render_locks[key]
+
+    def _lock_path(self, key):
+        return self.directory / f'{key}.lock'
+
+    def _claim(self, key):
+        """Take the cross-process render lock for key; False if another process holds it."""
+        path = self._lock_path(key)
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                pass
+            try:
+                if time.time() - path.stat().st_mtime < RENDER_LOCK_STALE:
+                    return False
+                path.unlink()  # left by a process that died mid-render
+            except FileNotFoundError:
+                pass
+        return False
+
+    def _store(self, key, pcm):
+        path = self._path(key)
+        tmp = path.with_name(f'{key}.{os.getpid()}.tmp')
+        try:
+            tmp.write_bytes(pcm)
+            os.replace(tmp, path)
+        except OSError as e:
+            with self._lock:
+                self.errors += 1
+            print(f"Phrase cache write failed: {e}")
+            return
+        evicted = []
+        with self._lock:
+            self.renders += 1
+            self._bytes += len(pcm) - self._index.pop(key, 0)
+            self._index[key] = len(pcm)
+            while self._bytes > self.max_bytes and len(self._index) > 1:
+                old, size = self._index.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                evicted.append(old)
+        for old in evicted:
+            try:
+                self._path(old).unlink()
+            except FileNotFoundError:
+                pass
+
+    def warm(self):
+        """Render every registered phrase not on disk yet, in a background thread."""
+        if self._warm_thread is not None and self._warm_thread.is_alive():
+            return
+        self._warm_thread = threading.Thread(target=self._warm, name='phrase-warmup', daemon=True)
+        self._warm_thread.start()
+
+    def _warm(self):
+        started = time.monotonic()
+        renders = self.renders
+        failures = 0
+        phrases = None
+        # Go round again if register() swapped the set while we worked
+        while phrases is not self.phrases:
+            phrases = self.phrases
+            for key, (text, voice) in phrases.items():
+                if self._read(key) is not None:
+                    continue
+                if self._render(key, text, voice) is None:
+                    failures += 1
+                    if failures >= WARM_MAX_FAILURES:
+                        print("Phrase warm-up stopped after repeated render failures")
+                        return
+                    continue
+                failures = 0
+        # Only what this process rendered; another may have done the rest
+        rendered = self.renders - renders
+        if rendered:
+            print(f"Phrase warm-up rendered {rendered} phrases in {time.monotonic() - started:.1f}s")
+
+    def stats(self):
+        with self._lock:
+            self._load()
+            return {
+                'phrases': len(self.phrases),
+                'cached': len(self._index),
+                'bytes': self._bytes,
+                'maxBytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'renders': self.renders,
+                'evictions': self.evictions,
+                'errors': self.errors,
+            }
+
+
+class GeminiRenderer:
+    """Renders a phrase by having a Live session in that voice say it."""
+
+    def __init__(self, url, timeout=30.0):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, text, voice):
+        from websockets.sync.client import connect
+
+        deadline = time.monotonic() + self.timeout
+        with connect(self.url, open_timeout=self.timeout, max_size=None) as ws:
+            ws.send(json.dumps(build_setup_message(voice, prompts.PHRASE_PROMPT)))
+            ws.recv(timeout=self.timeout)  # setupComplete
+            ws.send(json.dumps({
+                'clientContent': {
+                    'turns': [{'role': 'user', 'parts': [{'text': text}]}],
+                    'turnComplete': True,
+                }
+            }))
+            pcm = bytearray()
+            while True:
+                message = ws.recv(timeout=max(0.0, deadline - time.monotonic()))
+                for frame in split_server_message(message)[0]:
+                    pcm += frame
+                if mentions(message, 'turnComplete'):
+                    break
+        if not pcm:
+            raise RuntimeError('no audio in reply')
+        return bytes(pcm)
+
+
+def stub_renderer(text, voice):
+    """Local stand-in: a soft tone per word, pitched by voice; no network."""
+    rate = RECEIVE_SAMPLE_RATE
+    pitch = 180 + 40 * (zlib.crc32(voice.encode()) % 5)
+    parts = []
+    for i, word in enumerate(text.split() or [text]):
+        t = np.arange(int(rate * (0.12 + 0.04 * min(len(word), 8)))) / rate
+        envelope = np.sin(np.pi * t / t[-1])
+        parts.append(0.3 * envelope * np.sin(2 * np.pi * pitch * (1 + 0.1 * (i % 3)) * t))
+        parts.append(np.zeros(int(rate * 0.06)))
+    return (np.concatenate(parts) * 32767).astype('<i2').tobytes()
+
+
+def load_renderer(spec, gemini_url):
+    """Renderer for a PHRASE_RENDERER setting: gemini, stub or module:function."""
+    if spec == 'gemini':
+        return GeminiRenderer(gemini_url)
+    if spec == 'stub':
+        return stub_renderer
+    module, _, name = spec.partition(':')
+    return getattr(importlib.import_module(module), name)
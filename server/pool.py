@@ -0,0 +1,201 @@
+"""
+Pre-warmed pool of Gemini Live upstream connections.
+
+Keeps sessions for the keys children are actually using already connected
+and past setupComplete, so a new child session can start relaying
+immediately instead of waiting on TLS, websocket upgrade and model setup.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+
+
+class PooledUpstream:
+    """An upstream connection that has already completed setup."""
+
+    def __init__(self, ws, setup_response):
+        self.ws = ws
+        self.setup_response = setup_response
+        self.created = time.monotonic()
+
+    def is_open(self):
+        return self.ws.close_code is None
+
+    async def close(self):
+        try:
+            await self.ws.close()
+        except Exception:
+            pass
+
+
+class UpstreamPool:
+    """Idle upstream connections keyed by (voice, mode, prompt).
+
+    `dial(key)` opens a new connection and returns (ws, setup_response).
+    Without start() the pool simply dials on every acquire(), which keeps it
+    safe to use from the per-connection event loops of the Flask server.
+
+    Warm-size policy: every key keeps enough connections to cover its
+    recent demand for the time a dial takes (acquires/s in the last
+    `demand_window` seconds x average dial time, doubled for headroom),
+    capped at `max_size`. The small base set from warm_keys() keeps
+    `warm_size` on top of that; any other key scales back to zero once it
+    has had no acquires for `demand_window` seconds.
+    """
+
+    def __init__(self, dial, warm_size=0, max_idle=240, max_size=None,
+                 demand_window=30, refill_interval=5, max_dials=8):
+        self._dial = dial
+        self.warm_size = warm_size
+        self.max_idle = max_idle
+        self.max_size = max_size if max_size is not None else warm_size * 4
+        self.demand_window = demand_window
+        self.refill_interval = refill_interval
+        self._idle = {}
+        self._demand = {}  # key -> acquire times in the last demand_window
+        self._dial_time = 1.0  # running average, seconds
+        self._warm_keys = []
+        self._warm_keys_fn = None
+        self._dialing = asyncio.Semaphore(max_dials)
+        self._wakeup = None
+        self._task = None
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.dial_failures = 0
+
+    def start(self, warm_keys):
+        """Begin keeping connections ready for the base keys and recent demand.
+
+        warm_keys is called again on every refill pass, so the base set can
+        change at runtime (e.g. after a prompt reload); idle connections for
+        keys that are neither in it nor in demand are closed.
+        """
+        self._warm_keys_fn = warm_keys
+        self._set_warm_keys(warm_keys())
+        if self.warm_size <= 0 or not self._warm_keys:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._maintain())
+
+    def _set_warm_keys(self, keys):
+        self._warm_keys = list(dict.fromkeys(keys))
+
+    async def stop(self):
+        """Stop refilling and close every idle connection."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        idle = [conn for conns in self._idle.values() for conn in conns]
+        self._idle.clear()
+        await asyncio.gather(*(conn.close() for conn in idle))
+
+    async def acquire(self, key):
+        """Return (ws, setup_response) for key, from the pool if possible."""
+        if self._task is not None:
+            self._demand.setdefault(key, deque()).append(time.monotonic())
+        conns = self._idle.get(key)
+        while conns:
+            conn = conns.popleft()
+            if conn.is_open() and time.monotonic() - conn.created < self.max_idle:
+                self.hits += 1
+                self._refill_soon()
+                return conn.ws, conn.setup_response
+            self.expired += 1
+            asyncio.create_task(conn.close())
+
+        self.misses += 1
+        self._refill_soon()
+        return await self._timed_dial(key)
+
+    def target_size(self, key):
+        """How many idle connections to keep ready for a key."""
+        demand = self._demand.get(key)
+        cutoff = time.monotonic() - self.demand_window
+        while demand and demand[0] < cutoff:
+            demand.popleft()
+        rate = len(demand) / self.demand_window if demand else 0.0
+        wanted = math.ceil(2 * rate * self._dial_time)
+        if key in self._warm_keys:
+            wanted += self.warm_size
+        return min(max(self.warm_size, self.max_size), wanted)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'dialFailures': self.dial_failures,
+            'idle': sum(len(conns) for conns in self._idle.values()),
+            'warmKeys': len(self._warm_keys),
+            'demandKeys': len(self._demand),
+            'warmSize': self.warm_size,
+            'avgDialMs': round(self._dial_time * 1000, 1),
+        }
+
+    def _refill_soon(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _maintain(self):
+        """Expire stale connections and top every wanted key back up."""
+        while True:
+            self._set_warm_keys(self._warm_keys_fn())
+            targets = {key: self.target_size(key)
+                       for key in dict.fromkeys(self._warm_keys + list(self._demand))}
+            # Keys nobody asked for lately are forgotten and scale to zero
+            for key in [k for k, demand in self._demand.items() if not demand]:
+                del self._demand[key]
+            self._expire(targets)
+            deficits = [
+                key
+                for key, target in targets.items()
+                for _ in range(target - len(self._idle.get(key, ())))
+            ]
+            results = await asyncio.gather(
+                *(self._add(key) for key in deficits), return_exceptions=True
+            )
+            failed = any(isinstance(r, Exception) for r in results)
+
+            self._wakeup.clear()
+            try:
+                # Back off after failures instead of hammering the endpoint
+                timeout = self.refill_interval * (4 if failed else 1)
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _expire(self, targets):
+        """Close stale connections and any beyond what their key still wants."""
+        now = time.monotonic()
+        for key, conns in list(self._idle.items()):
+            keep = targets.get(key, 0)
+            for _ in range(len(conns)):
+                conn = conns.popleft()
+                if keep > 0 and conn.is_open() and now - conn.created < self.max_idle:
+                    conns.append(conn)
+                    keep -= 1
+                else:
+                    self.expired += 1
+                    asyncio.create_task(conn.close())
+            if not conns:
+                del self._idle[key]
+
+    async def _add(self, key):
+        async with self._dialing:
+            ws, setup_response = await self._timed_dial(key)
+        self._idle.setdefault(key, deque()).append(PooledUpstream(ws, setup_response))
+
+    async def _timed_dial(self, key):
+        started = time.monotonic()
+        try:
+            result = await self._dial(key)
+        except Exception:
+            self.dial_failures += 1
+            raise
+        self._dial_time += 0.2 * (time.monotonic() - started - self._dial_time)
+        return result
@@ -0,0 +1,159 @@
+"""
+Per-child progress rollups.
+
+Progress is kept as running totals per child, per child and day, and per
+child and word, updated in place (one upsert per table) as sessions run:
+a star, a learned word, a session start or the minutes of a finished
+connection. /api/stats reads those rows directly, so its cost depends on
+the number of days and words asked for, never on how much history has
+piled up. Lives in the same SQLite file as the session store.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS child_totals (
+    child TEXT PRIMARY KEY,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL DEFAULT 0,
+    stars INTEGER NOT NULL DEFAULT 0,
+    words INTEGER NOT NULL DEFAULT 0,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS child_days (
+    child TEXT NOT NULL,
+    day TEXT NOT NULL,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL DEFAULT 0,
+    stars INTEGER NOT NULL DEFAULT 0,
+    words INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (child, day)
+);
+CREATE TABLE IF NOT EXISTS child_words (
+    child TEXT NOT NULL,
+    word TEXT NOT NULL,
+    stars INTEGER NOT NULL DEFAULT 0,
+    learned INTEGER NOT NULL DEFAULT 0,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (child, word)
+);
+"""
+
+# Columns of child_totals / child_days each event adds to
+_COUNTERS = ('sessions', 'seconds', 'stars', 'words')
+
+
+class ProgressStore:
+    """Incrementally maintained progress aggregates, one connection per thread."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._db().executescript(SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def session_started(self, child):
+        self._add(child, sessions=1)
+
+    def session_time(self, child, seconds):
+        if seconds > 0:
+            self._add(child, seconds=seconds)
+
+    def star(self, child, word):
+        self._add(child, word=word, stars=1)
+
+    def learned(self, child, word):
+        self._add(child, word=word, words=1)
+
+    def _add(self, child, word=None, **deltas):
+        """Add deltas to the child's total, today's row and the word row."""
+        now = time.time()
+        values = [deltas.get(name, 0) for name in _COUNTERS]
+        sets = ', '.join(f'{name} = {name} + excluded.{name}' for name in _COUNTERS)
+        db = self._db()
+        db.execute('BEGIN')
+        try:
+            db.execute(
+                'INSERT INTO child_totals (child, sessions, seconds, stars, words, first_seen, last_seen) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                f'ON CONFLICT (child) DO UPDATE SET {sets}, last_seen = excluded.last_seen',
+                (child, *values, now, now),
+            )
+            db.execute(
+                'INSERT INTO child_days (child, day, sessions, seconds, stars, words) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                f'ON CONFLICT (child, day) DO UPDATE SET {sets}',
+                (child, date.fromtimestamp(now).isoformat(), *values),
+            )
+            if word is not None:
+                db.execute(
+                    'INSERT INTO child_words (child, word, stars, learned, last_seen) '
+                    'VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (child, word) DO UPDATE SET '
+                    'stars = stars + excluded.stars, learned = learned + excluded.learned, '
+                    'last_seen = excluded.last_seen',
+                    (child, word, deltas.get('stars', 0), deltas.get('words', 0), now),
+                )
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+
+    def stats(self, child, days=7, words=50):
+        """Totals, the last `days` daily rows and the most recent words for a child."""
+        db = self._db()
+        row = db.execute(
+            'SELECT sessions, seconds, stars, words, first_seen, last_seen '
+            'FROM child_totals WHERE child = ?', (child,),
+        ).fetchone()
+        if row is None:
+            return None
+        today = date.today()
+        since = (today - timedelta(days=days - 1)).isoformat()
+        day_rows = db.execute(
+            'SELECT day, sessions, seconds, stars, words FROM child_days '
+            'WHERE child = ? AND day >= ? ORDER BY day DESC', (child, since),
+        ).fetchall()
+        word_rows = db.execute(
+            'SELECT word, stars, learned, last_seen FROM child_words '
+            'WHERE child = ? ORDER BY last_seen DESC LIMIT ?', (child, words),
+        ).fetchall()
+        days_out = [_day(r) for r in day_rows]
+        empty = {'day': today.isoformat(), 'sessions': 0, 'minutes': 0, 'stars': 0, 'words': 0}
+        return {
+            'child': child,
+            'total': {
+                'sessions': row[0],
+                'minutes': round(row[1] / 60, 1),
+                'stars': row[2],
+                'words': row[3],
+                'firstSeen': row[4],
+                'lastSeen': row[5],
+            },
+            'today': days_out[0] if days_out and days_out[0]['day'] == empty['day'] else empty,
+            'days': days_out,
+            'words': [
+                {'word': w, 'stars': s, 'learned': l, 'lastSeen': t}
+                for w, s, l, t in word_rows
+            ],
+        }
+
+
+def _day(row):
+    day, sessions, seconds, stars, words = row
+    return {'day': day, 'sessions': sessions, 'minutes': round(seconds / 60, 1),
+            'stars': stars, 'words': words}
@@ -0,0 +1,632 @@
+"""
+Async relay between a TinyTalk client socket and the Gemini Live API.
+
+The relay only talks to the client through a small async interface
+(receive/send/close), so the same code serves flask-sock connections
+(app.py) and native asyncio websockets (asgi.py).
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import deque
+
+import websockets
+
+import prompts
+from config import (
+    API_KEY, GEMINI_URL, POOL_WARM_SIZE, POOL_MAX_SIZE, POOL_MAX_IDLE,
+    DNS_CACHE_TTL, UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_CA_FILE,
+    PHRASE_CACHE_DIR, PHRASE_CACHE_MB, PHRASE_RENDERER, PHRASE_WARM, VOICES,
+    TRANSCRIPT_DIR, TRANSCRIPT_QUEUE, RECORDINGS_DIR, RECORD_BUFFER_SECONDS,
+    RECONNECT_ATTEMPTS, REPLAY_SECONDS, DOWNSTREAM_MAX_LAG_MS,
+)
+from codec import mulaw_decode, mulaw_encode
+from dial import UpstreamDialer
+from framing import (
+    AUDIO_FORMAT_MULAW, BINARY_AUDIO_FORMATS, RECEIVE_SAMPLE_RATE, SEND_SAMPLE_RATE, client_audio,
+    mentions, realtime_audio_message, server_audio_message, server_content,
+    split_server_message,
+)
+from metrics import (
+    BYTES, DOWNSTREAM_DROPPED, DOWNSTREAM_QUEUED_SECONDS, FRAMES,
+    RECONNECT_GAP_SECONDS, RECONNECTS, RELAY_SECONDS, RESAMPLE_AUDIO_SECONDS,
+    RESAMPLE_CPU_SECONDS, RESPONSE_SECONDS, SESSIONS, SETUP_SECONDS,
+    SLOW_CLIENT_DISCONNECTS, UPSTREAM_DIAL_SECONDS, UPSTREAM_ERRORS, UPSTREAM_TLS_HANDSHAKES,
+)
+from outbound import OutboundQueue, json_audio_ms, pcm_ms
+from phrases import PhraseCache, load_renderer
+from pool import UpstreamPool
+from setup_cache import setup_cache
+from rechunk import Rechunker
+from replay import ReplayBuffer
+from resample import Resampler
+from recorder import AudioRecorder
+from transcripts import TranscriptLog
+from vad import VAD_OFF
+
+TIME_UPDATE_INTERVAL = 30  # seconds between timeUpdate messages
+UPSTREAM_MAX_QUEUE = 16  # Gemini frames buffered before TCP backpressure
+COALESCE_MS = 200  # most PCM joined into one client frame when behind
+RECONNECT_BACKOFF = 0.5  # seconds before the second reconnect attempt, doubling
+MAX_PENDING_CONTROL = 64  # upstream control messages held during a reconnect
+
+# Metric series resolved once so the relay only does list updates
+RELAY_UP = RELAY_SECONDS.labels('upstream')
+RELAY_DOWN = RELAY_SECONDS.labels('downstream')
+FRAMES_UP = FRAMES.labels('upstream')
+FRAMES_DOWN = FRAMES.labels('downstream')
+BYTES_UP = BYTES.labels('upstream')
+BYTES_DOWN = BYTES.labels('downstream')
+UPSTREAM_ERRORS_SETUP = UPSTREAM_ERRORS.labels('setup')
+UPSTREAM_ERRORS_RELAY = UPSTREAM_ERRORS.labels('relay')
+RESAMPLE_CPU_UP = RESAMPLE_CPU_SECONDS.labels('upstream')
+RESAMPLE_CPU_DOWN = RESAMPLE_CPU_SECONDS.labels('downstream')
+RESAMPLE_AUDIO_UP = RESAMPLE_AUDIO_SECONDS.labels('upstream')
+RESAMPLE_AUDIO_DOWN = RESAMPLE_AUDIO_SECONDS.labels('downstream')
+DIAL_DNS = UPSTREAM_DIAL_SECONDS.labels('dns')
+DIAL_TCP = UPSTREAM_DIAL_SECONDS.labels('tcp')
+DIAL_TLS = UPSTREAM_DIAL_SECONDS.labels('tls')
+DIAL_UPGRADE = UPSTREAM_DIAL_SECONDS.labels('upgrade')
+DIAL_SETUP = UPSTREAM_DIAL_SECONDS.labels('setup')
+TLS_RESUMED = UPSTREAM_TLS_HANDSHAKES.labels('yes')
+TLS_FULL = UPSTREAM_TLS_HANDSHAKES.labels('no')
+
+
+class FlaskSockClient:
+    """Async wrapper around a blocking flask-sock websocket."""
+
+    def __init__(self, ws):
+        self.ws = ws
+
+    async def receive(self, timeout=None):
+        return await asyncio.to_thread(self.ws.receive, timeout)
+
+    async def send(self, data):
+        await asyncio.to_thread(self.ws.send, data)
+
+    async def close(self):
+        try:
+            await asyncio.to_thread(self.ws.close)
+        except Exception:
+            pass
+
+
+class MeteredResampler:
+    """A Resampler that adds its CPU time and audio duration to the metrics."""
+
+    def __init__(self, rate_in, rate_out, cpu, audio):
+        self.resampler = Resampler(rate_in, rate_out)
+        self.cpu = cpu
+        self.audio = audio
+
+    def process(self, pcm):
+        started = time.thread_time()
+        out = self.resampler.process(pcm)
+        self.cpu.inc(time.thread_time() - started)
+        self.audio.inc(len(pcm) / 2 / self.resampler.rate_in)
+        return out
+
+    def reset(self):
+        self.resampler.reset()
+
+
+class ClientAudioPipeline:
+    """Processing stages applied to client PCM before it goes upstream.
+
+    Each stage's process() takes one PCM chunk and returns a list of items
+    to pass on: bytes are audio for the next stage, str items are
+    ready-to-send JSON control messages that skip the remaining stages.
+    A stage with a flush() method empties its buffer ahead of any control
+    message, so buffered audio is never reordered behind it.
+    """
+
+    def __init__(self, session):
+        self.stages = []
+        if session.vad is not None:
+            self.stages.append(session.vad)
+        if session.frame_ms:
+            self.stages.append(Rechunker(session.frame_ms))
+
+    @property
+    def active(self):
+        return bool(self.stages)
+
+    def process(self, pcm):
+        items = [pcm]
+        for stage in self.stages:
+            staged = []
+            for item in items:
+                if isinstance(item, str):
+                    if hasattr(stage, 'flush'):
+                        staged.extend(stage.flush())
+                    staged.append(item)
+                else:
+                    staged.extend(stage.process(item))
+            items = staged
+        return items
+
+
+async def relay(client, gemini_ws, session):
+    """Forward messages both ways until either side closes or time runs out.
+
+    Client audio is sent upstream before the next client message is read,
+    so a slow Gemini connection pushes back on the client. Messages for the
+    client go through the session's bounded OutboundQueue and a writer
+    task: a slow client loses stale model audio rather than stalling the
+    Gemini reader, and one that stops reading entirely is disconnected.
+
+    In pcm16 mode, binary client frames are raw PCM and model audio is sent
+    back as binary frames; JSON messages pass through in both modes. mulaw
+    mode is the same with 8-bit mu-law frames, decoded on arrival and
+    encoded just before queueing for the client.
+    Client audio at another rate than 16 kHz is resampled before anything
+    else sees it, and model audio is resampled to session.output_rate.
+
+    In words mode the curriculum watches input transcripts and turn ends,
+    and a client {"nextWord": true} message moves on explicitly; the new
+    word is injected into the live upstream session as a clientContent turn.
+
+    With session.transcript set, transcripts and turn ends are queued to
+    the transcript log after the message has been forwarded. With
+    session.record set, decoded PCM from both legs goes to the recorder.
+
+    Per-frame relay time, frame and byte counts, and reply latency are
+    recorded to the metrics module as frames pass.
+
+    If Gemini drops the connection, a new one is set up for the session
+    and recent client audio is replayed to it; the client socket and the
+    session clock carry on as if nothing happened.
+    """
+    binary_audio = session.audio_format in BINARY_AUDIO_FORMATS
+    mulaw = session.audio_format == AUDIO_FORMAT_MULAW
+    pipeline = ClientAudioPipeline(session)
+    resample_in = resample_out = None
+    if session.input_rate != SEND_SAMPLE_RATE:
+        resample_in = MeteredResampler(
+            session.input_rate, SEND_SAMPLE_RATE, RESAMPLE_CPU_UP, RESAMPLE_AUDIO_UP,
+        )
+    if session.output_rate != RECEIVE_SAMPLE_RATE:
+        resample_out = MeteredResampler(
+            RECEIVE_SAMPLE_RATE, session.output_rate, RESAMPLE_CPU_DOWN, RESAMPLE_AUDIO_DOWN,
+        )
+    # Client audio has to be decoded and re-wrapped rather than passed through
+    reencode = pipeline.active or resample_in is not None
+    curriculum = session.curriculum
+    markers = ()
+    if session.transcript:
+        markers = ('inputTranscription', 'outputTranscription', 'turnComplete')
+    elif curriculum is not None:
+        markers = ('inputTranscription', 'turnComplete')
+    recording = audio_recorder.open(session.id) if session.record else None
+    outbound = OutboundQueue(
+        DOWNSTREAM_MAX_LAG_MS, coalesce_ms=COALESCE_MS if binary_audio else 0,
+    )
+    session.outbound = outbound
+
+    # Reply latency: end of the child's speech to the model's first audio
+    speech_end = 0.0
+    awaiting_reply = False
+    model_speaking = False
+
+    # The live Gemini connection; replaced by reconnect() if it drops
+    upstream = gemini_ws
+    connected = asyncio.Event()
+    connected.set()
+    replay = ReplayBuffer(REPLAY_SECONDS)
+    # Control messages (word changes, client turns) that missed the upstream
+    pending_control = deque(maxlen=MAX_PENDING_CONTROL)
+
+    async def send_upstream(message, audio=False):
+        """Send to Gemini; kept for after a reconnect if the link is down.
+
+        Audio goes in the replay buffer either way. Other messages are held
+        only if they couldn't be sent, and follow the replay.
+        """
+        if audio:
+            replay.append(message)
+        if not connected.is_set():
+            if not audio:
+                pending_control.append(message)
+            return
+        try:
+            await upstream.send(message)
+        except websockets.ConnectionClosed:
+            # gemini_to_client sees the close and reconnects
+            if not audio:
+                pending_control.append(message)
+
+    def send_control(message):
+        """Queue a non-audio message for the client; never dropped."""
+        if not outbound.put(message, time.perf_counter()):
+            SLOW_CLIENT_DISCONNECTS.inc()
+            print(f"Client for session {session.id} stopped reading, disconnecting")
+            writer.cancel()
+
+    def send_audio(message, audio_ms):
+        dropped = outbound.dropped
+        outbound.put_audio(message, audio_ms, time.perf_counter())
+        DOWNSTREAM_QUEUED_SECONDS.observe(outbound.audio_ms / 1000)
+        if outbound.dropped != dropped:
+            DOWNSTREAM_DROPPED.inc(outbound.dropped - dropped)
+
+    def client_audio_frame(pcm):
+        """Model PCM (24 kHz Int16) as this client takes it."""
+        if resample_out is not None:
+            pcm = resample_out.process(pcm)
+        if not binary_audio:
+            return server_audio_message(pcm, session.output_rate)
+        if mulaw:
+            return mulaw_encode(pcm)
+        return pcm
+
+    async def client_writer():
+        """Send queued messages to the client as fast as it takes them."""
+        while True:
+            message, enqueued_at = await outbound.get()
+            await client.send(message)
+            RELAY_DOWN.observe(time.perf_counter() - enqueued_at)
+
+    async def send_word_update(changed, learned=False):
+        if changed:
+            await send_upstream(setup_cache.get().word_change_message(session.current_word, learned))
+        send_control(json.dumps({'wordUpdate': curriculum.state()}))
+
+    async def client_to_gemini():
+        """Forward client audio to Gemini."""
+        nonlocal speech_end, awaiting_reply
+        while True:
+            data = await client.receive()
+            if data is None:
+                break
+            if isinstance(data, str) and '"nextWord"' in data:
+                control = next_word_control(data)
+                if control is not None:
+                    # Ours, not Gemini's: consumed whatever the mode
+                    if control and curriculum is not None:
+                        curriculum.advance()
+                        await send_word_update(True)
+                    continue
+            started = time.perf_counter()
+            await forward_client(data)
+            RELAY_UP.observe(time.perf_counter() - started)
+            FRAMES_UP.inc()
+            BYTES_UP.inc(len(data))
+
+            if isinstance(data, str) and 'realtimeInput' not in data:
+                continue
+            # Without VAD every audio chunk counts as speech
+            heard_at = session.vad.last_speech if session.vad is not None else time.monotonic()
+            if heard_at != speech_end:
+                speech_end = heard_at
+                if not model_speaking:
+                    awaiting_reply = True
+
+    async def forward_client(data):
+        if isinstance(data, str):
+            pcm = client_audio(data) if reencode or recording is not None else None
+        elif binary_audio:
+            pcm = mulaw_decode(data) if mulaw else data
+        else:
+            pcm = None
+        if pcm is not None and len(pcm) % 2:
+            pcm = pcm[:-1]  # a torn Int16 sample; everything below assumes whole ones
+        if pcm is not None and resample_in is not None:
+            pcm = resample_in.process(pcm)
+        if pcm is not None and recording is not None:
+            recording.child_audio(pcm)
+            if isinstance(data, str) and not reencode:
+                pcm = None  # decoded only for the recording; forward as-is
+        if pcm is None:
+            audio = isinstance(data, str) and 'realtimeInput' in data
+            await send_upstream(data, audio=audio)
+            return
+        for item in pipeline.process(pcm):
+            if isinstance(item, str):
+                # Activity markers: part of the audio stream, so replayed in place
+                await send_upstream(item, audio=True)
+            else:
+                await send_upstream(realtime_audio_message(item), audio=True)
+
+    async def gemini_to_client():
+        """Forward Gemini responses to client, reconnecting if Gemini drops."""
+        while True:
+            try:
+                async for response in upstream:
+                    await forward_response(response)
+            except websockets.ConnectionClosed as e:
+                print(f"Gemini connection lost: {e}")
+            except Exception as e:
+                UPSTREAM_ERRORS_RELAY.inc()
+                print(f"Gemini receive error: {e}")
+                return
+            # Gemini went away without us closing it
+            UPSTREAM_ERRORS_RELAY.inc()
+            if not await reconnect():
+                return
+
+    async def forward_response(response):
+        nonlocal model_speaking, awaiting_reply
+        if not binary_audio and resample_out is None:
+            has_audio = mentions(response, 'inlineData')
+            if has_audio:
+                send_audio(response, json_audio_ms(response))
+                if recording is not None:
+                    for pcm in split_server_message(response)[0]:
+                        recording.teacher_audio(pcm)
+            else:
+                send_control(response)
+        else:
+            frames, remainder = split_server_message(response)
+            has_audio = bool(frames)
+            for pcm in frames:
+                if recording is not None:
+                    recording.teacher_audio(pcm)
+                send_audio(client_audio_frame(pcm), pcm_ms(pcm))
+            if remainder is not None:
+                send_control(remainder)
+        FRAMES_DOWN.inc()
+        BYTES_DOWN.inc(len(response))
+
+        if has_audio:
+            if awaiting_reply:
+                RESPONSE_SECONDS.observe(time.monotonic() - speech_end)
+                awaiting_reply = False
+            model_speaking = True
+        elif mentions(response, 'interrupted'):
+            # The child talked over the model; its queued audio is stale
+            outbound.interrupt()
+            if resample_out is not None:
+                resample_out.reset()
+            model_speaking = False
+        elif mentions(response, 'turnComplete'):
+            model_speaking = False
+
+        if markers:
+            content = server_content(response, markers)
+            if content:
+                if session.transcript:
+                    capture(content)
+                if curriculum is not None:
+                    await track_word(content)
+
+    async def reconnect():
+        """Replace a dropped Gemini connection; False if the relay should end.
+
+        The new connection gets the cached setup for the session's current
+        mode and word, then the replay buffer (recent audio plus anything
+        the child said during the gap), then control messages that missed
+        the old connection, before live audio resumes.
+        """
+        nonlocal upstream, model_speaking
+        connected.clear()
+        model_speaking = False
+        gap_start = time.monotonic()
+        for attempt in range(RECONNECT_ATTEMPTS):
+            if session.is_expired():
+                return False
+            if attempt:
+                await asyncio.sleep(RECONNECT_BACKOFF * 2 ** (attempt - 1))
+            try:
+                ws, _ = await upstream_pool.acquire(upstream_key(session))
+            except Exception as e:
+                UPSTREAM_ERRORS_SETUP.inc()
+                print(f"Gemini reconnect failed: {e}")
+                continue
+            stale, upstream = upstream, ws
+            await stale.close()
+            try:
+                sent = 0
+                while pending := replay.after(sent):
+                    for seq, message in pending:
+                        await ws.send(message)
+                        sent = seq
+                while pending_control:
+                    await ws.send(pending_control[0])
+                    pending_control.popleft()
+            except websockets.ConnectionClosed:
+                continue
+            connected.set()
+            gap = time.monotonic() - gap_start
+            session.reconnects += 1
+            RECONNECTS.inc()
+            RECONNECT_GAP_SECONDS.observe(gap)
+            print(f"Gemini reconnected for session {session.id} after {gap * 1000:.0f} ms")
+            return True
+        return False
+
+    def capture(content):
+        """Queue transcript events; never waits on disk."""
+        now = round(time.time(), 3)
+        word = session.current_word[0] if session.current_word else None
+        for field, role in (('inputTranscription', 'child'), ('outputTranscription', 'teacher')):
+            text = (content.get(field) or {}).get('text')
+            if text:
+                transcript_log.record(session.id, {'t': now, 'role': role, 'text': text, 'word': word})
+        if content.get('turnComplete'):
+            transcript_log.record(session.id, {'t': now, 'role': 'teacher', 'turnComplete': True})
+
+    async def track_word(content):
+        """Update the curriculum from transcripts and turn ends."""
+        stars = session.stars
+        learned = changed = False
+        text = (content.get('inputTranscription') or {}).get('text')
+        if text:
+            learned = changed = curriculum.heard(text)
+        if content.get('turnComplete') and not changed:
+            changed = curriculum.turn_complete()
+        if changed or session.stars != stars:
+            await send_word_update(changed, learned)
+
+    async def timer_check():
+        """Send time updates every 30 seconds."""
+        while True:
+            await asyncio.sleep(min(TIME_UPDATE_INTERVAL, session.time_remaining()))
+            if session.is_expired():
+                break
+            send_control(json.dumps({
+                'timeUpdate': {
+                    'remaining': session.time_remaining(),
+                    'stars': session.stars
+                }
+            }))
+
+    writer = asyncio.create_task(client_writer())
+    legs = [
+        asyncio.create_task(client_to_gemini()),
+        asyncio.create_task(gemini_to_client()),
+        writer,
+    ]
+    timer = asyncio.create_task(timer_check())
+    try:
+        # Either side closing or the session deadline ends the relay
+        await asyncio.wait(legs, timeout=session.time_remaining(),
+                           return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in legs + [timer]:
+            task.cancel()
+        await asyncio.gather(*legs, timer, return_exceptions=True)
+        if recording is not None:
+            recording.close()
+        if upstream is not gemini_ws:
+            await upstream.close()
+
+    # Session expired - send goodbye
+    if session.is_expired():
+        goodbye = random.choice(prompts.GOODBYES)
+        # Spoken goodbye if it's been rendered; never wait on a render here
+        pcm = await asyncio.to_thread(phrase_cache.get, goodbye, session.voice, False)
+        if pcm:
+            if resample_out is not None:
+                resample_out.reset()
+            await client.send(client_audio_frame(pcm))
+        await client.send(json.dumps({
+            'sessionEnd': {
+                'reason': 'timeout',
+                'message': goodbye,
+                'stars': session.stars
+            }
+        }))
+
+
+def next_word_control(data):
+    """For a {"nextWord": ...} client message, whether it asks to move on; else None."""
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return None
+    if not isinstance(message, dict) or 'nextWord' not in message:
+        return None
+    return message['nextWord'] is True
+
+
+def upstream_key(session):
+    """Pool key for the upstream setup a session needs."""
+    return (setup_cache.get().version,) + setup_cache.key_for(session)
+
+
+def warm_upstream_keys():
+    """Pool keys to keep warm for the current prompt version."""
+    version = setup_cache.get().version
+    return [(version,) + key for key in setup_cache.warm_keys()]
+
+
+def proxy_config(session):
+    """Client-leg options negotiated from the config message."""
+    return {
+        'audioFormat': session.audio_format,
+        'vad': session.vad.mode if session.vad is not None else VAD_OFF,
+        'frameMs': session.frame_ms,
+        'curriculum': session.curriculum is not None,
+        'transcript': session.transcript,
+        'record': session.record,
+        'inputRate': session.input_rate,
+        'outputRate': session.output_rate,
+    }
+
+
+def warm_phrases():
+    """Render missing canned phrases in the background, if configured to."""
+    if PHRASE_WARM and (API_KEY or PHRASE_RENDERER != 'gemini'):
+        phrase_cache.warm()
+
+
+def reload_phrases():
+    """Pick up the canned phrases of a reloaded prompts.py."""
+    register_phrases()
+    warm_phrases()
+
+
+async def open_upstream(key):
+    """Connect to Gemini and complete setup; returns (ws, setup_response)."""
+    payload = setup_cache.payload(key[1:])
+    gemini_ws, timings = await upstream_dialer.connect(
+        GEMINI_URL.format(key=API_KEY), max_queue=UPSTREAM_MAX_QUEUE
+    )
+    DIAL_DNS.observe(timings.dns)
+    DIAL_TCP.observe(timings.tcp)
+    if timings.tls is not None:
+        DIAL_TLS.observe(timings.tls)
+        (TLS_RESUMED if timings.tls_resumed else TLS_FULL).inc()
+    DIAL_UPGRADE.observe(timings.upgrade)
+    try:
+        # Send setup with system prompt
+        started = time.perf_counter()
+        await gemini_ws.send(payload)
+
+        # Wait for setup complete
+        setup_response = await gemini_ws.recv()
+        DIAL_SETUP.observe(time.perf_counter() - started)
+    except BaseException:
+        await gemini_ws.close()
+        raise
+    return gemini_ws, setup_response
+
+
+transcript_log = TranscriptLog(TRANSCRIPT_DIR, TRANSCRIPT_QUEUE)
+audio_recorder = AudioRecorder(RECORDINGS_DIR, RECORD_BUFFER_SECONDS)
+
+phrase_cache = PhraseCache(
+    PHRASE_CACHE_DIR, load_renderer(PHRASE_RENDERER, GEMINI_URL.format(key=API_KEY)),
+    int(PHRASE_CACHE_MB * 1024 * 1024),
+)
+
+
+def register_phrases():
+    phrase_cache.register(prompts.GREETINGS + prompts.ENCOURAGEMENTS + prompts.GOODBYES, VOICES)
+
+
+register_phrases()
+setup_cache.on_reload(reload_phrases)
+
+upstream_dialer = UpstreamDialer(DNS_CACHE_TTL, UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_CA_FILE)
+upstream_pool = UpstreamPool(open_upstream, POOL_WARM_SIZE, POOL_MAX_IDLE, POOL_MAX_SIZE)
+
+
+async def run_proxy(client, session):
+    """Get a set-up Gemini connection, then relay until the session ends."""
+    SESSIONS.inc()
+    try:
+        started = time.perf_counter()
+        try:
+            gemini_ws, setup_response = await upstream_pool.acquire(upstream_key(session))
+        except Exception:
+            UPSTREAM_ERRORS_SETUP.inc()
+            raise
+        SETUP_SECONDS.observe(time.perf_counter() - started)
+        try:
+            await client.send(json.dumps({'proxyConfig': proxy_config(session)}))
+            await client.send(setup_response)
+            await relay(client, gemini_ws, session)
+        finally:
+            await gemini_ws.close()
+
+    except Exception as e:
+        print(f"Proxy error: {e}")
+        try:
+            await client.send(json.dumps({'error': str(e)}))
+        except Exception:
+            pass
+    finally:
+        await client.close()
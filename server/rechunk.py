@@ -0,0 +1,66 @@
+"""
+Re-chunking of client PCM into fixed-duration frames.
+
+Browsers deliver audio in whatever block size their capture node uses
+(4096 samples = 256 ms in web/index.html). The rechunker splits or
+accumulates it into frames of a configured duration: short frames
+(20-40 ms) for lower latency, longer ones for fewer upstream messages.
+"""
+
+MIN_FRAME_MS = 10
+MAX_FRAME_MS = 1000
+
+
+class Rechunker:
+    """Split a PCM stream into fixed-size frames.
+
+    Partial frames are collected in one preallocated buffer; whole frames
+    are sliced straight out of the incoming chunk, so no frame is built by
+    concatenating byte strings.
+    """
+
+    def __init__(self, frame_ms, sample_rate=16000, sample_width=2):
+        self.frame_ms = frame_ms
+        self.frame_bytes = sample_rate * frame_ms // 1000 * sample_width
+        self.sample_width = sample_width
+        self._buffer = bytearray(self.frame_bytes)
+        self._view = memoryview(self._buffer)
+        self._fill = 0
+
+    def process(self, pcm):
+        """Return the complete frames available after adding `pcm`."""
+        data = memoryview(pcm)
+        frames = []
+        pos = 0
+        size = len(data)
+
+        # Top up a partial frame first
+        if self._fill:
+            take = min(self.frame_bytes - self._fill, size)
+            self._view[self._fill:self._fill + take] = data[:take]
+            self._fill += take
+            pos = take
+            if self._fill < self.frame_bytes:
+                return frames
+            frames.append(bytes(self._buffer))
+            self._fill = 0
+
+        # Whole frames straight from the input
+        while size - pos >= self.frame_bytes:
+            frames.append(bytes(data[pos:pos + self.frame_bytes]))
+            pos += self.frame_bytes
+
+        # Keep the remainder for next time
+        rest = size - pos
+        if rest:
+            self._view[:rest] = data[pos:]
+            self._fill = rest
+        return frames
+
+    def flush(self):
+        """Return any partial frame (whole samples only) and reset."""
+        fill = self._fill - self._fill % self.sample_width
+        self._fill = 0
+        if not fill:
+            return []
+        return [bytes(self._view[:fill])]
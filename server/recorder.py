@@ -0,0 +1,201 @@
+"""
+Session audio recording.
+
+Both legs of a recorded session are written as 16-bit mono WAV files,
+<directory>/<session id>-<start>-child.wav (16 kHz) and
+...-teacher.wav (24 kHz). The relay copies decoded PCM into a fixed-size
+ring buffer per leg, which is a memcpy under a lock. One writer thread
+per process drains every active ring to its file a few times a second,
+so a session's memory stays at the two ring buffers however long it
+runs. If the disk falls so far behind that a ring fills up, whole chunks
+are dropped and counted rather than stalling the relay. Gaps while nobody
+is speaking are not recorded, so each file is the concatenated speech of
+that side. At shutdown, close() drains what is buffered and finalizes
+every open file, so none is left with unpatched WAV sizes.
+"""
+
+import atexit
+import re
+import threading
+import time
+import wave
+from pathlib import Path
+
+_UNSAFE = re.compile(r'[^A-Za-z0-9_.-]')
+
+INPUT_RATE = 16000
+OUTPUT_RATE = 24000
+SAMPLE_WIDTH = 2  # bytes, Int16
+
+
+class PcmRing:
+    """Fixed-capacity byte ring shared by one producer and one consumer."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buf = bytearray(capacity)
+        self._start = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self.dropped = 0  # bytes
+
+    def write(self, data):
+        """Append a chunk; drops all of it if it doesn't fit."""
+        n = len(data)
+        with self._lock:
+            if n > self.capacity - self._size:
+                self.dropped += n
+                return False
+            end = (self._start + self._size) % self.capacity
+            first = min(n, self.capacity - end)
+            self._buf[end:end + first] = data[:first]
+            if first < n:
+                self._buf[:n - first] = data[first:]
+            self._size += n
+            return True
+
+    def read_into(self, out):
+        """Move everything buffered into `out`; returns the byte count."""
+        with self._lock:
+            n = self._size
+            first = min(n, self.capacity - self._start)
+            out[:first] = self._buf[self._start:self._start + first]
+            if first < n:
+                out[first:n] = self._buf[:n - first]
+            self._start = (self._start + n) % self.capacity
+            self._size = 0
+            return n
+
+
+class Leg:
+    """One direction of a recording: its ring and, once opened, its WAV file."""
+
+    def __init__(self, path, rate, buffer_seconds):
+        self.path = path
+        self.rate = rate
+        self.ring = PcmRing(int(rate * SAMPLE_WIDTH * buffer_seconds))
+        self.wav = None
+        self.bytes = 0
+
+    def drain(self, scratch):
+        n = self.ring.read_into(scratch)
+        if not n:
+            return 0
+        if self.wav is None:
+            self.wav = wave.open(str(self.path), 'wb')
+            self.wav.setnchannels(1)
+            self.wav.setsampwidth(SAMPLE_WIDTH)
+            self.wav.setframerate(self.rate)
+        self.wav.writeframes(memoryview(scratch)[:n])
+        self.bytes += n
+        return n
+
+    def close(self):
+        if self.wav is not None:
+            self.wav.close()
+            self.wav = None
+
+
+class Recording:
+    """Per-session handle the relay writes PCM into."""
+
+    def __init__(self, directory, session_id, buffer_seconds):
+        name = _UNSAFE.sub('_', str(session_id))[:128].lstrip('.') or '_'
+        stem = f'{name}-{int(time.time())}'
+        self.input = Leg(directory / f'{stem}-child.wav', INPUT_RATE, buffer_seconds)
+        self.output = Leg(directory / f'{stem}-teacher.wav', OUTPUT_RATE, buffer_seconds)
+        self.closed = False
+
+    def child_audio(self, pcm):
+        self.input.ring.write(pcm)
+
+    def teacher_audio(self, pcm):
+        self.output.ring.write(pcm)
+
+    def close(self):
+        """Stop recording; the writer thread flushes what is left and closes the files."""
+        self.closed = True
+
+
+class AudioRecorder:
+    """Owns the writer thread that drains every active recording."""
+
+    def __init__(self, directory, buffer_seconds=2.0, interval=0.25):
+        self.directory = Path(directory)
+        self.buffer_seconds = buffer_seconds
+        self.interval = interval
+        self._recordings = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        # One scratch buffer big enough for the largest ring
+        self._scratch = bytearray(int(OUTPUT_RATE * SAMPLE_WIDTH * buffer_seconds))
+        self.started = 0
+        self.finished = 0
+        self.bytes_written = 0
+        self.bytes_dropped = 0
+        self.errors = 0
+
+    def open(self, session_id):
+        """Start recording a session; returns its Recording."""
+        recording = Recording(self.directory, session_id, self.buffer_seconds)
+        with self._lock:
+            if self._thread is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name='recorder', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+            self._recordings.add(recording)
+            self.started += 1
+        return recording
+
+    def close(self, timeout=5):
+        """Drain and finalize every open recording, then stop the writer thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping.set()
+        thread.join(timeout)
+
+    def _run(self):
+        while True:
+            stopping = self._stopping.wait(self.interval)
+            with self._lock:
+                recordings = list(self._recordings)
+            for recording in recordings:
+                # Read the flag first so audio written before close() is drained
+                closed = recording.closed or stopping
+                try:
+                    for leg in (recording.input, recording.output):
+                        self.bytes_written += leg.drain(self._scratch)
+                except OSError as e:
+                    self.errors += 1
+                    print(f"Recording write failed: {e}")
+                    closed = True
+                if closed:
+                    self._finish(recording)
+            if stopping:
+                return
+
+    def _finish(self, recording):
+        for leg in (recording.input, recording.output):
+            try:
+                leg.close()
+            except OSError:
+                self.errors += 1
+            self.bytes_dropped += leg.ring.dropped
+        with self._lock:
+            self._recordings.discard(recording)
+            self.finished += 1
+
+    def stats(self):
+        with self._lock:
+            active = len(self._recordings)
+        return {
+            'active': active,
+            'started': self.started,
+            'finished': self.finished,
+            'bytesWritten': self.bytes_written,
+            'bytesDropped': self.bytes_dropped,
+            'errors': self.errors,
+        }
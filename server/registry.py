@@ -0,0 +1,120 @@
+"""
+Registry of live proxy sessions.
+
+Shared by Flask worker threads, the asyncio server's event loop and REST
+handlers, so every access goes through one lock. Sessions are capped, and
+an expiry heap lets entries whose connection never cleaned up be reaped in
+O(log n) each instead of scanning the whole table.
+"""
+
+import heapq
+import threading
+import time
+
+
+class SessionRegistry:
+    """Thread-safe, bounded map of session id -> Session."""
+
+    def __init__(self, max_sessions, grace=60):
+        self.max_sessions = max_sessions
+        self.grace = grace  # seconds past a session's limit before reaping
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._expiry = []  # heap of (deadline, seq, session)
+        self._seq = 0
+        self.reaped = 0
+        self.rejected = 0
+
+    def add(self, session):
+        """Register a session; returns False if the registry is full.
+
+        A session reusing a live id replaces the older entry.
+        """
+        with self._lock:
+            self._reap_locked(time.time())
+            if session.id not in self._sessions and len(self._sessions) >= self.max_sessions:
+                self.rejected += 1
+                return False
+            self._sessions[session.id] = session
+            self._schedule_locked(session)
+            return True
+
+    def reschedule(self, session):
+        """Re-key a session's expiry after its start time or limit changed."""
+        with self._lock:
+            if self._sessions.get(session.id) is session:
+                self._schedule_locked(session)
+
+    def _deadline(self, session):
+        return session.start_time + session.max_duration + self.grace
+
+    def _schedule_locked(self, session):
+        self._seq += 1
+        heapq.heappush(self._expiry, (self._deadline(session), self._seq, session))
+
+    def remove(self, session):
+        """Unregister a session, unless its id now belongs to a newer one."""
+        with self._lock:
+            if self._sessions.get(session.id) is session:
+                del self._sessions[session.id]
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def __contains__(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
+
+    def reap(self):
+        """Drop sessions that outlived their limit; returns how many."""
+        with self._lock:
+            return self._reap_locked(time.time())
+
+    def _reap_locked(self, now):
+        reaped = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            _, _, session = heapq.heappop(self._expiry)
+            if self._sessions.get(session.id) is not session:
+                continue
+            if self._deadline(session) > now:
+                # Its limit moved later since this entry was pushed
+                self._schedule_locked(session)
+                continue
+            del self._sessions[session.id]
+            reaped += 1
+        self.reaped += reaped
+        # Removed sessions leave stale heap entries; rebuild when they dominate
+        if len(self._expiry) > 2 * len(self._sessions) + 64:
+            live = {id(s) for s in self._sessions.values()}
+            self._expiry = [e for e in self._expiry if id(e[2]) in live]
+            heapq.heapify(self._expiry)
+        return reaped
+
+    def snapshot(self):
+        """Counts plus age and time remaining for every live session."""
+        now = time.time()
+        with self._lock:
+            self._reap_locked(now)
+            live = list(self._sessions.values())
+        return {
+            'live': len(live),
+            'capacity': self.max_sessions,
+            'reaped': self.reaped,
+            'rejected': self.rejected,
+            'sessions': [
+                {
+                    'mode': s.mode,
+                    'voice': s.voice,
+                    'age': round(now - s.start_time, 1),
+                    'timeRemaining': round(s.time_remaining(), 1),
+                    'reconnects': s.reconnects,
+                    'outbound': s.outbound.stats() if s.outbound is not None else None,
+                }
+                for s in live
+            ],
+        }
@@ -0,0 +1,33 @@
+"""
+Recent client audio kept for upstream reconnects.
+
+The relay appends every audio message it sends (or would send) upstream.
+After a dropped Gemini connection is replaced, the last few seconds are
+sent to the new connection first, so a word the child was saying when
+the link dropped isn't lost. The buffer is bounded by age and by message
+count.
+"""
+
+import time
+from collections import deque
+
+
+class ReplayBuffer:
+    """Sequence-numbered upstream audio messages from the last `seconds`."""
+
+    def __init__(self, seconds=3.0, max_messages=256):
+        self.seconds = seconds
+        self._messages = deque(maxlen=max_messages)  # (seq, time, message)
+        self._seq = 0
+
+    def append(self, message):
+        self._seq += 1
+        self._messages.append((self._seq, time.monotonic(), message))
+
+    def after(self, seq):
+        """Messages newer than `seq` and not older than the window, oldest first."""
+        cutoff = time.monotonic() - self.seconds
+        messages = self._messages
+        while messages and messages[0][1] < cutoff:
+            messages.popleft()
+        return [(s, m) for s, _, m in messages if s > seq]
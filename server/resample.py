@@ -0,0 +1,128 @@
+"""
+Streaming polyphase resampling of Int16 PCM.
+
+Browsers capture at the device rate (usually 44.1 or 48 kHz); Gemini
+takes 16 kHz input and sends 24 kHz output. A Resampler converts one
+stream by the rational factor up/down (48000 -> 16000 is 1/3,
+44100 -> 16000 is 160/441) with a Kaiser-windowed sinc lowpass split into
+`up` polyphase branches, so each output sample costs one short dot
+product with the branch for its phase. The last few input samples and
+the output phase carry over between chunks, so the output doesn't depend
+on how the stream was chunked.
+
+Filters are designed once per rate pair and shared by every stream; a
+stream's own state is its filter history, a few hundred bytes.
+"""
+
+from functools import lru_cache
+from math import ceil, gcd
+
+import numpy as np
+
+# Rates clients may declare with "inputRate" / "outputRate"
+RATES = (8000, 11025, 16000, 22050, 24000, 32000, 44100, 48000)
+
+ATTENUATION_DB = 60.0  # stopband rejection
+TRANSITION = 0.2  # transition band width as a fraction of the lower Nyquist rate
+CUTOFF = 0.9  # -6 dB point as a fraction of the lower Nyquist rate
+
+
+@lru_cache(maxsize=None)
+def design(rate_in, rate_out):
+    """Filter tables for a rate pair, shared by every stream.
+
+    Returns (up, down, branches, block, matrix). branches[p] is the
+    polyphase branch for output phase p, reversed so it dots directly with
+    an ascending window of input samples. The phase pattern repeats every
+    `up` outputs; `matrix` holds the branches for `block` such periods at
+    their offsets, so a whole block of outputs is one matrix product.
+    """
+    g = gcd(rate_in, rate_out)
+    up, down = rate_out // g, rate_in // g
+    nyquist = min(rate_in, rate_out) / 2
+    # Kaiser's estimate of the taps per input sample for the transition width
+    taps = ceil((ATTENUATION_DB - 7.95) / (14.36 * TRANSITION * nyquist / rate_in))
+    beta = 0.1102 * (ATTENUATION_DB - 8.7)
+    n = up * taps
+    # Lowpass at the upsampled rate; cutoff as a fraction of its Nyquist
+    cutoff = CUTOFF * nyquist / (rate_in * up / 2)
+    t = np.arange(n) - (n - 1) / 2
+    h = up * cutoff * np.sinc(cutoff * t) * np.kaiser(n, beta)
+    branches = np.ascontiguousarray(h.reshape(taps, up).T[:, ::-1], dtype=np.float32)
+
+    # Enough periods per block that a block spans at least the filter length
+    block = max(1, ceil(taps / down))
+    matrix = np.zeros((block * up, block * down + taps - 1), dtype=np.float32)
+    for q in range(block * up):
+        start, phase = divmod(q * down, up)
+        matrix[q, start:start + taps] = branches[phase]
+    return up, down, branches, block, np.ascontiguousarray(matrix.T)
+
+
+class Resampler:
+    """Resample one Int16 PCM stream from rate_in to rate_out, chunk by chunk.
+
+    Whole blocks of output go through one matrix product; the outputs
+    before the first and after the last whole block in a chunk are
+    gathered one window each, so every output is produced as soon as its
+    input has arrived.
+    """
+
+    def __init__(self, rate_in, rate_out):
+        self.rate_in = rate_in
+        self.rate_out = rate_out
+        self.up, self.down, self.branches, block, self.matrix = design(rate_in, rate_out)
+        self.taps = self.branches.shape[1]
+        self.block_outputs = block * self.up
+        self.block_inputs = block * self.down
+        self.reset()
+
+    def reset(self):
+        """Forget the stream so far (e.g. the audio it belonged to was dropped)."""
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        # Position of the next output sample, in 1/up input samples from the chunk start
+        self._pos = 0
+        self._in_block = 0  # outputs of the current block already produced
+
+    def process(self, pcm):
+        """Resampled PCM for the next chunk of the stream."""
+        x = np.frombuffer(pcm, dtype='<i2', count=len(pcm) // 2)
+        buf = np.concatenate((self._history, x.astype(np.float32)))
+        end = len(x) * self.up  # outputs at positions before this have their input
+        parts = []
+        if self._in_block:
+            parts.append(self._gather(buf, end, self.block_outputs - self._in_block))
+        if not self._in_block:
+            start = self._pos // self.up
+            blocks = (len(x) - start) // self.block_inputs
+            if blocks > 0:
+                segments = _windows(buf, start, self.matrix.shape[0], self.block_inputs, blocks)
+                parts.append((segments @ self.matrix).ravel())
+                self._pos += blocks * self.block_inputs * self.up
+            parts.append(self._gather(buf, end, self.block_outputs))
+        self._pos -= end
+        self._history = buf[len(buf) - self.taps + 1:].copy()
+        out = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        np.rint(out, out=out)
+        np.clip(out, -32768, 32767, out=out)
+        return out.astype('<i2').tobytes()
+
+    def _gather(self, buf, end, limit):
+        """Up to `limit` outputs computed one window each."""
+        count = min(limit, max(0, -(-(end - self._pos) // self.down)))
+        pos = self._pos + self.down * np.arange(count)
+        # windows[i] is the `taps` input samples ending at output i's input sample
+        windows = _windows(buf, 0, self.taps, 1, len(buf) - self.taps + 1)[pos // self.up]
+        if self.up == 1:
+            out = windows @ self.branches[0]
+        else:
+            out = np.einsum('ij,ij->i', windows, self.branches[pos % self.up])
+        self._pos += self.down * count
+        self._in_block = (self._in_block + count) % self.block_outputs
+        return out
+
+
+def _windows(buf, start, length, step, count):
+    """View of `count` windows of `length` samples, `step` apart, from buf[start]."""
+    itemsize = buf.itemsize
+    return np.ndarray((count, length), buf.dtype, buf, start * itemsize, (step * itemsize, itemsize))
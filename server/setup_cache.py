@@ -0,0 +1,254 @@
+"""
+Precompiled Gemini setup payloads with hot prompt reload.
+
+Every (mode, voice, word, transcription) a session can start with is
+rendered from prompts.py and serialized to its setup JSON once, keyed by
+a prompt version hash. When prompts.py or the optional PROMPTS_FILE changes on
+disk, a new table is built off to the side, in a worker thread, and
+swapped in with a single reference assignment. Live sessions keep the
+upstream they already have; new sessions pick up the new prompts without
+a restart. Code that keeps something derived from prompts.py (word
+lists, phrase audio) registers an on_reload() hook to rebuild it.
+"""
+
+import hashlib
+import importlib
+import json
+import threading
+import time
+from pathlib import Path
+
+import prompts
+from config import MODEL, VOICES, DEFAULT_VOICE, PROMPTS_FILE, TRANSCRIPTS
+
+PROMPT_NAMES = (
+    'TODDLER_TEACHER_PROMPT',
+    'WORD_TEACHING_PROMPT',
+    'CONVERSATION_PROMPT',
+    'SONG_PROMPT',
+    'NEXT_WORD_PROMPT',
+    'WORD_LEARNED_PROMPT',
+)
+
+# Transcription a session's setup asks for: the curriculum reads the
+# child's words, and a recorded transcript needs both sides
+NO_TRANSCRIPTION = ()
+INPUT_TRANSCRIPTION = ('input',)
+FULL_TRANSCRIPTION = ('input', 'output')
+
+
+def build_setup_message(voice, system_prompt, transcription=NO_TRANSCRIPTION):
+    """Build the Gemini setup message for a voice and system prompt.
+
+    transcription names the sides ('input', 'output') Gemini should
+    transcribe; it's off unless something reads it.
+    """
+    message = {
+        'setup': {
+            'model': f'models/{MODEL}',
+            'generation_config': {
+                'response_modalities': ['AUDIO'],
+                'speech_config': {
+                    'voice_config': {
+                        'prebuilt_voice_config': {
+                            'voice_name': voice
+                        }
+                    }
+                }
+            },
+            'system_instruction': {
+                'parts': [{'text': system_prompt}]
+            },
+        }
+    }
+    for side in transcription:
+        message['setup'][f'{side}_audio_transcription'] = {}
+    return message
+
+
+class PromptSet:
+    """One immutable version of the prompts and their setup payloads."""
+
+    def __init__(self, texts, word_lists, version):
+        self.texts = texts
+        self.word_lists = word_lists
+        self.version = version
+        self.loaded_at = time.time()
+        self.payloads = {}
+        for voice in VOICES:
+            for key in self.start_keys(voice):
+                self.payloads[key] = self.render(key)
+        self.word_messages = {}
+        for words in word_lists.values():
+            for word in words:
+                for learned in (False, True):
+                    self.word_messages[word, learned] = self.render_word_change(word, learned)
+
+    def start_keys(self, voice):
+        """Keys for every way a session with this voice can start."""
+        for transcription in (NO_TRANSCRIPTION, FULL_TRANSCRIPTION):
+            yield ('conversation', voice, None, transcription)
+            yield ('songs', voice, None, transcription)
+        for words in self.word_lists.values():
+            for word in words:
+                for transcription in (INPUT_TRANSCRIPTION, FULL_TRANSCRIPTION):
+                    yield ('words', voice, word, transcription)
+
+    def system_prompt(self, mode, word):
+        """Get the system prompt for a mode and (word, hint) pair."""
+        base = self.texts['TODDLER_TEACHER_PROMPT']
+        if mode == 'words' and word:
+            text, desc = word
+            return base + '\n\n' + self.texts['WORD_TEACHING_PROMPT'].format(word=text, category=desc)
+        elif mode == 'songs':
+            return base + '\n\n' + self.texts['SONG_PROMPT']
+        else:
+            return base + '\n\n' + self.texts['CONVERSATION_PROMPT']
+
+    def word_change_message(self, word, learned=False):
+        """Serialized clientContent turn that switches the live session to a word.
+
+        learned praises the child for the previous word; a skip or running
+        out of turns moves on without it.
+        """
+        message = self.word_messages.get((tuple(word), learned))
+        if message is None:
+            message = self.render_word_change(word, learned)
+        return message
+
+    def render_word_change(self, word, learned=False):
+        text, desc = word
+        prompt = self.texts['WORD_LEARNED_PROMPT' if learned else 'NEXT_WORD_PROMPT']
+        return json.dumps({
+            'clientContent': {
+                'turns': [{
+                    'role': 'user',
+                    'parts': [{'text': prompt.format(word=text, category=desc)}],
+                }],
+                'turnComplete': True,
+            }
+        })
+
+    def render(self, key):
+        mode, voice, word, transcription = key
+        return json.dumps(build_setup_message(voice, self.system_prompt(mode, word), transcription))
+
+
+class SetupCache:
+    """Serialized setup payloads for the current prompt version."""
+
+    def __init__(self, prompts_file=None, check_interval=2.0):
+        self.prompts_file = Path(prompts_file) if prompts_file else None
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._mtimes = self._stat()
+        self.reloads = 0
+        self._hooks = []
+        self.current = self._load(reload_module=False)
+
+    def key_for(self, session):
+        """Cache key for the setup a session needs."""
+        word = session.current_word if session.mode == 'words' else None
+        mode = session.mode if session.mode in ('words', 'songs') else 'conversation'
+        if mode == 'words' and not word:
+            mode = 'conversation'
+        if session.transcript:
+            transcription = FULL_TRANSCRIPTION
+        elif mode == 'words':
+            transcription = INPUT_TRANSCRIPTION
+        else:
+            transcription = NO_TRANSCRIPTION
+        return (mode, session.voice, tuple(word) if word else None, transcription)
+
+    def payload(self, key):
+        """Serialized setup JSON for a key; renders on the fly if uncached."""
+        prompt_set = self.get()
+        payload = prompt_set.payloads.get(key)
+        if payload is None:
+            payload = prompt_set.render(key)
+        return payload
+
+    def warm_keys(self):
+        """Base upstream pool keys: the default voice's conversation and first word.
+
+        Everything else is warmed only while children are using it.
+        """
+        prompt_set = self.get()
+        # Sessions that don't choose take the TRANSCRIPTS default
+        talk = FULL_TRANSCRIPTION if TRANSCRIPTS else NO_TRANSCRIPTION
+        words_mode = FULL_TRANSCRIPTION if TRANSCRIPTS else INPUT_TRANSCRIPTION
+        keys = [('conversation', DEFAULT_VOICE, None, talk)]
+        for words in prompt_set.word_lists.values():
+            if words:
+                keys.append(('words', DEFAULT_VOICE, words[0], words_mode))
+                break
+        return keys
+
+    def on_reload(self, hook):
+        """Call hook() after each successful reload, in the reload thread."""
+        self._hooks.append(hook)
+
+    def get(self):
+        """Current PromptSet; checks for changed prompt files in the background.
+
+        The rebuild never runs on the caller, which may be the event loop;
+        the new set is returned once it's ready.
+        """
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            self._checked = now
+            threading.Thread(target=self._maybe_reload, name='prompt-reload', daemon=True).start()
+        return self.current
+
+    def _stat(self):
+        paths = [Path(prompts.__file__)]
+        if self.prompts_file:
+            paths.append(self.prompts_file)
+        return tuple(p.stat().st_mtime_ns if p.exists() else None for p in paths)
+
+    def _maybe_reload(self):
+        mtimes = self._stat()
+        if mtimes == self._mtimes:
+            return
+        # One thread rebuilds; others keep serving the current set meanwhile
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._mtimes = mtimes
+            self.current = self._load(reload_module=True)
+            self.reloads += 1
+            print(f"Prompts reloaded (version {self.current.version})")
+        except Exception as e:
+            print(f"Prompt reload failed, keeping version {self.current.version}: {e}")
+            return
+        finally:
+            self._lock.release()
+        for hook in self._hooks:
+            try:
+                hook()
+            except Exception as e:
+                print(f"Prompt reload hook failed: {e}")
+
+    def _load(self, reload_module):
+        module = importlib.reload(prompts) if reload_module else prompts
+        texts = {name: getattr(module, name) for name in PROMPT_NAMES}
+        digest = hashlib.sha1(Path(module.__file__).read_bytes())
+        if self.prompts_file and self.prompts_file.exists():
+            raw = self.prompts_file.read_bytes()
+            overrides = json.loads(raw)
+            texts.update({k: v for k, v in overrides.items() if k in PROMPT_NAMES})
+            digest.update(raw)
+        return PromptSet(texts, module.WORD_LISTS, digest.hexdigest()[:12])
+
+    def stats(self):
+        current = self.current
+        return {
+            'version': current.version,
+            'loadedAt': current.loaded_at,
+            'payloads': len(current.payloads),
+            'reloads': self.reloads,
+        }
+
+
+setup_cache = SetupCache(PROMPTS_FILE)
@@ -0,0 +1,97 @@
+"""
+Session state shared across server processes.
+
+Elapsed time, stars and word progress live in a local SQLite database in
+WAL mode, so every worker (and every reconnect) sees the same screen-time
+limit and progress for a session id. Reads and writes are single-row
+primary-key operations on a local file, so they stay well under a
+millisecond and are done inline.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    start_time REAL NOT NULL,
+    max_duration REAL NOT NULL,
+    stars INTEGER NOT NULL DEFAULT 0,
+    word_index INTEGER NOT NULL DEFAULT 0,
+    expires REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires);
+"""
+
+
+class SessionStore:
+    """SQLite-backed session state, one connection per thread."""
+
+    def __init__(self, path, retention=12 * 3600, purge_interval=600):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.retention = retention  # seconds to keep rows after expiry
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._local = threading.local()
+        db = self._db()
+        db.executescript(SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def restore(self, session):
+        """Register a session, or adopt the stored state for its id.
+
+        Returns True if the session id was already known, in which case the
+        original start time and limit are kept so reconnecting (to any
+        worker) never resets the screen-time clock.
+        """
+        db = self._db()
+        now = time.time()
+        if now - self._last_purge > self.purge_interval:
+            self._last_purge = now
+            self.purge()
+        db.execute(
+            'INSERT OR IGNORE INTO sessions '
+            '(id, start_time, max_duration, stars, word_index, expires, updated) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (session.id, session.start_time, session.max_duration,
+             session.stars, session.word_index,
+             session.start_time + session.max_duration, now),
+        )
+        start_time, max_duration, stars, word_index = db.execute(
+            'SELECT start_time, max_duration, stars, word_index FROM sessions WHERE id = ?',
+            (session.id,),
+        ).fetchone()
+        if start_time == session.start_time:
+            return False
+        session.start_time = start_time
+        session.max_duration = max_duration
+        session.stars = stars
+        session.word_index = word_index
+        return True
+
+    def save(self, session):
+        """Persist a session's progress."""
+        self._db().execute(
+            'UPDATE sessions SET stars = ?, word_index = ?, updated = ? WHERE id = ?',
+            (session.stars, session.word_index, time.time(), session.id),
+        )
+
+    def purge(self):
+        """Delete rows for sessions that expired more than `retention` ago."""
+        cur = self._db().execute(
+            'DELETE FROM sessions WHERE expires < ?',
+            (time.time() - self.retention,),
+        )
+        return cur.rowcount
@@ -0,0 +1,137 @@
+"""
+Per-session transcript capture.
+
+The relay hands transcript events to `TranscriptLog.record`, which only
+appends to a bounded in-memory queue. A background thread drains the queue
+in batches and appends one JSON line per event to
+<directory>/<session id>.jsonl, so disk latency never reaches the audio
+path. When the queue is full new events are dropped and counted rather
+than blocking the relay.
+"""
+
+import atexit
+import json
+import queue
+import re
+import threading
+import time
+from pathlib import Path
+
+_UNSAFE = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def transcript_path(directory, session_id):
+    """File holding a session's transcript; ids are sanitized for the filesystem."""
+    name = _UNSAFE.sub('_', str(session_id))[:128].lstrip('.') or '_'
+    return Path(directory) / f'{name}.jsonl'
+
+
+class TranscriptLog:
+    """Bounded queue of transcript events plus the thread that writes them."""
+
+    def __init__(self, directory, max_queue=10000, flush_interval=0.5, batch_size=512):
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval  # seconds to gather a batch
+        self.batch_size = batch_size
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+
+    def record(self, session_id, event):
+        """Queue one event (a JSON-serializable dict) without blocking."""
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait((session_id, event))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.recorded += 1
+        return True
+
+    def read(self, session_id):
+        """All events written so far for a session, oldest first (operator use; not served over HTTP)."""
+        path = transcript_path(self.directory, session_id)
+        if not path.exists():
+            return []
+        events = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue  # torn final line from a crash
+        return events
+
+    def close(self, timeout=5):
+        """Write out everything queued and stop the writer thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping.set()
+        thread.join(timeout)
+
+    def stats(self):
+        return {
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'written': self.written,
+            'batches': self.batches,
+            'errors': self.errors,
+            'queued': self._queue.qsize(),
+        }
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name='transcripts', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            batch = self._gather()
+            if batch:
+                self._write(batch)
+            elif self._stopping.is_set():
+                return
+
+    def _gather(self):
+        """Wait for one event, then collect more for up to flush_interval."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                remaining = 0
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        by_session = {}
+        for session_id, event in batch:
+            by_session.setdefault(session_id, []).append(json.dumps(event, ensure_ascii=False))
+        for session_id, lines in by_session.items():
+            try:
+                with open(transcript_path(self.directory, session_id), 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(lines) + '\n')
+            except OSError as e:
+                self.errors += 1
+                print(f"Transcript write failed for {session_id}: {e}")
+                continue
+            self.written += len(lines)
+        self.batches += 1
@@ -0,0 +1,177 @@
+"""
+Server-side voice activity detection for client audio.
+
+A vectorized energy / zero-crossing detector with pre-roll and hangover
+that drops (or thins out) silent 16 kHz Int16 PCM before it is sent
+upstream. Enough audio around each utterance is kept for Gemini's own turn
+detection: a short pre-roll before speech onset and a hangover of trailing
+silence after it.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+VAD_OFF = 'off'
+VAD_DROP = 'drop'  # send nothing while silent
+VAD_THIN = 'thin'  # send one of every `thin_every` silent chunks
+VAD_MODES = (VAD_OFF, VAD_DROP, VAD_THIN)
+
+# Sent once when suppression starts, so Gemini flushes its input buffer
+# instead of waiting for more audio.
+AUDIO_STREAM_END = '{"realtimeInput":{"audioStreamEnd":true}}'
+
+# Process-wide counters across all sessions; Flask sessions run on
+# separate threads, so updates go through _count()
+totals = {'chunks': 0, 'suppressed': 0, 'bytes_suppressed': 0}
+_totals_lock = threading.Lock()
+
+
+def _count(chunks=0, suppressed=0, bytes_suppressed=0):
+    with _totals_lock:
+        totals['chunks'] += chunks
+        totals['suppressed'] += suppressed
+        totals['bytes_suppressed'] += bytes_suppressed
+
+
+def snapshot():
+    """A consistent copy of the process-wide totals."""
+    with _totals_lock:
+        return dict(totals)
+
+
+class VoiceActivityDetector:
+    """Per-session VAD; process() returns the chunks to forward upstream.
+
+    Each incoming chunk is split into `frame_ms` analysis frames. A frame
+    is speech if its energy is `margin_db` above the tracked noise floor,
+    or a few dB lower with a fricative-like zero-crossing rate. A chunk is
+    forwarded if it contains speech or falls inside the hangover window.
+    """
+
+    def __init__(self, mode=VAD_DROP, sample_rate=16000, frame_ms=20,
+                 margin_db=12.0, min_dbfs=-55.0, hangover_ms=800,
+                 preroll_ms=300, thin_every=8):
+        self.mode = mode
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.sample_rate = sample_rate
+        self.margin_db = margin_db
+        self.min_dbfs = min_dbfs
+        self.hangover = sample_rate * hangover_ms // 1000
+        self.preroll_samples = sample_rate * preroll_ms // 1000
+        self.thin_every = thin_every
+
+        self.noise_db = -60.0
+        self.hang_left = 0
+        self.silent_run = 0
+        self.in_speech = False
+        self.preroll = deque()
+        self.preroll_len = 0
+        self.last_speech = 0.0  # time.monotonic() of the last voiced chunk
+
+        self.chunks = 0
+        self.suppressed = 0
+        self.bytes_suppressed = 0
+
+    def frame_stats(self, pcm):
+        """Per-frame energy in dBFS and zero-crossing rate."""
+        samples = np.frombuffer(pcm, dtype='<i2')
+        n = len(samples) // self.frame_len
+        if n == 0:
+            frames = samples.reshape(1, -1).astype(np.float32)
+        else:
+            frames = samples[:n * self.frame_len].reshape(n, self.frame_len).astype(np.float32)
+        power = np.mean(frames * frames, axis=1)
+        db = 10.0 * np.log10(power + 1e-9) - 90.309  # 20*log10(32768)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / max(1, frames.shape[1] - 1)
+        return db, zcr
+
+    def is_speech(self, pcm):
+        """Speech decision per analysis frame, updating the noise floor."""
+        db, zcr = self.frame_stats(pcm)
+        threshold = max(self.min_dbfs, self.noise_db + self.margin_db)
+        speech = (db > threshold) | ((db > threshold - 6.0) & (zcr > 0.25) & (zcr < 0.6))
+
+        # The quietest frame of a chunk estimates the background level; the
+        # floor follows drops at once and rises slowly through speech.
+        level = float(db.min())
+        if level < self.noise_db:
+            self.noise_db = level
+        else:
+            self.noise_db += 0.05 * (level - self.noise_db)
+        return speech
+
+    def process(self, pcm):
+        """Return the list of messages to forward for one PCM chunk.
+
+        Items are bytes (audio) or str (a JSON control message to send as-is).
+        Empty chunks pass through untouched; a trailing odd byte is dropped.
+        """
+        if len(pcm) % 2:
+            pcm = pcm[:-1]
+        if not pcm:
+            return [pcm]
+        self.chunks += 1
+        _count(chunks=1)
+        speech = self.is_speech(pcm)
+        samples = len(pcm) // 2
+
+        if speech.any():
+            self.last_speech = time.monotonic()
+            last = int(np.flatnonzero(speech)[-1])
+            tail = samples - (last + 1) * self.frame_len
+            self.hang_left = max(0, self.hangover - max(0, tail))
+            out = self._flush_preroll()
+            out.append(pcm)
+            self.in_speech = True
+            self.silent_run = 0
+            return out
+
+        if self.hang_left > 0:
+            self.hang_left -= samples
+            return [pcm]
+
+        # Silent and past the hangover
+        out = []
+        if self.in_speech:
+            self.in_speech = False
+            out.append(AUDIO_STREAM_END)
+        self.silent_run += 1
+        if self.mode == VAD_THIN and self.silent_run % self.thin_every == 0:
+            out.append(pcm)
+            return out
+
+        self._suppress(pcm)
+        return out
+
+    def _suppress(self, pcm):
+        self.suppressed += 1
+        self.bytes_suppressed += len(pcm)
+        _count(suppressed=1, bytes_suppressed=len(pcm))
+
+        # Keep the most recent silence as pre-roll for the next onset
+        self.preroll.append(pcm)
+        self.preroll_len += len(pcm) // 2
+        while self.preroll and self.preroll_len - len(self.preroll[0]) // 2 >= self.preroll_samples:
+            self.preroll_len -= len(self.preroll.popleft()) // 2
+
+    def _flush_preroll(self):
+        """Hand back buffered pre-roll; it is no longer suppressed."""
+        out = list(self.preroll)
+        nbytes = sum(len(p) for p in out)
+        self.suppressed -= len(out)
+        self.bytes_suppressed -= nbytes
+        _count(suppressed=-len(out), bytes_suppressed=-nbytes)
+        self.preroll.clear()
+        self.preroll_len = 0
+        return out
+
+    def stats(self):
+        return {
+            'chunks': self.chunks,
+            'suppressed': self.suppressed,
+            'bytesSuppressed': self.bytes_suppressed,
+        }
@@ -0,0 +1,323 @@
+"""
+Custom word lists per family.
+
+Families add their own lists (sibling names, pets, words in their home
+language) next to the built-in WORD_LISTS. A custom list with the same
+category as a built-in one replaces it for that family. Lists live in
+the same SQLite file as the session store, indexed by (family, category)
+and by (family, case-folded word) for prefix search.
+
+Every edit bumps the family's version and stamps it on the list it
+changed, so a (family, category, version) is never reused, even across a
+delete and re-create. Serialized API responses are cached per process
+under those versions: a cache hit costs one indexed version lookup, and
+an edit made in any worker is seen by all of them. Built-in lists are
+keyed by their own version, which set_builtin() bumps when a prompts.py
+reload swaps them.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS word_families (
+    family TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS word_lists (
+    id INTEGER PRIMARY KEY,
+    family TEXT NOT NULL,
+    category TEXT NOT NULL,
+    language TEXT,
+    words INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (family, category)
+);
+CREATE TABLE IF NOT EXISTS word_list_words (
+    list_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    family TEXT NOT NULL,
+    word TEXT NOT NULL,
+    word_key TEXT NOT NULL,
+    hint TEXT NOT NULL,
+    PRIMARY KEY (list_id, position)
+);
+CREATE INDEX IF NOT EXISTS word_list_words_search ON word_list_words (family, word_key);
+"""
+
+MAX_NAME = 64  # family and category ids
+MAX_WORDS = 500  # per list
+MAX_WORD = 64
+MAX_HINT = 200
+MAX_PAGE = 500
+
+
+def clean_words(raw, category):
+    """[(word, hint)] from a request body's words; raises ValueError if invalid.
+
+    Each entry is a word string, a [word, hint] pair or {"word", "hint"};
+    a missing hint defaults to the category name, which the word prompt
+    uses as context.
+    """
+    if not isinstance(raw, list) or not 0 < len(raw) <= MAX_WORDS:
+        raise ValueError(f'words must be a list of 1 to {MAX_WORDS} entries')
+    words = []
+    for entry in raw:
+        if isinstance(entry, str):
+            word, hint = entry, None
+        elif isinstance(entry, list) and len(entry) == 2:
+            word, hint = entry
+        elif isinstance(entry, dict):
+            word, hint = entry.get('word'), entry.get('hint')
+        else:
+            raise ValueError(f'invalid word entry {entry!r}')
+        if not isinstance(word, str) or not word.strip() or len(word) > MAX_WORD:
+            raise ValueError(f'words must be 1 to {MAX_WORD} characters')
+        if hint is not None and (not isinstance(hint, str) or len(hint) > MAX_HINT):
+            raise ValueError(f'hints must be at most {MAX_HINT} characters')
+        words.append((word.strip(), (hint or '').strip() or category))
+    return words
+
+
+def valid_name(name):
+    return isinstance(name, str) and 0 < len(name) <= MAX_NAME
+
+
+class WordListStore:
+    """Custom word lists over the built-in ones, with a versioned response cache."""
+
+    def __init__(self, path, builtin, cache_size=4096):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.builtin = builtin
+        self.builtin_version = 0
+        self.cache_size = cache_size
+        self._local = threading.local()
+        self._db().executescript(SCHEMA)
+        self._responses = OrderedDict()  # (kind, ..., version) -> serialized JSON
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    def put(self, family, category, words, language=None):
+        """Create or replace a family's list; returns its summary."""
+        now = time.time()
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            version = self._bump_family(db, family)
+            row = db.execute(
+                'SELECT id FROM word_lists WHERE family = ? AND category = ?',
+                (family, category),
+            ).fetchone()
+            if row is None:
+                list_id = db.execute(
+                    'INSERT INTO word_lists (family, category, language, words, version, updated) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (family, category, language, len(words), version, now),
+                ).lastrowid
+            else:
+                list_id = row[0]
+                db.execute(
+                    'UPDATE word_lists SET language = ?, words = ?, version = ?, updated = ? WHERE id = ?',
+                    (language, len(words), version, now, list_id),
+                )
+                db.execute('DELETE FROM word_list_words WHERE list_id = ?', (list_id,))
+            db.executemany(
+                'INSERT INTO word_list_words (list_id, position, family, word, word_key, hint) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(list_id, i, family, word, word.casefold(), hint)
+                 for i, (word, hint) in enumerate(words)],
+            )
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        self._forget(family)
+        return {'category': category, 'language': language, 'words': len(words),
+                'version': version, 'updated': now}
+
+    def delete(self, family, category):
+        """Remove a family's list; False if it had none by that name."""
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT id FROM word_lists WHERE family = ? AND category = ?', (family, category),
+            ).fetchone()
+            if row is not None:
+                db.execute('DELETE FROM word_list_words WHERE list_id = ?', (row[0],))
+                db.execute('DELETE FROM word_lists WHERE id = ?', (row[0],))
+                self._bump_family(db, family)
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        self._forget(family)
+        return row is not None
+
+    def _bump_family(self, db, family):
+        db.execute(
+            'INSERT INTO word_families (family, version) VALUES (?, 1) '
+            'ON CONFLICT (family) DO UPDATE SET version = version + 1',
+            (family,),
+        )
+        return db.execute(
+            'SELECT version FROM word_families WHERE family = ?', (family,),
+        ).fetchone()[0]
+
+    def _list_row(self, family, category):
+        """(id, version) of a family's custom list, or None."""
+        if family is None:
+            return None
+        return self._db().execute(
+            'SELECT id, version FROM word_lists WHERE family = ? AND category = ?',
+            (family, category),
+        ).fetchone()
+
+    def _family_version(self, family):
+        row = self._db().execute(
+            'SELECT version FROM word_families WHERE family = ?', (family,),
+        ).fetchone()
+        return row[0] if row else 0
+
+    def words(self, family, category):
+        """[(word, hint)] a session in this category should use, or None."""
+        row = self._list_row(family, category)
+        if row is None:
+            return self.builtin.get(category)
+        return self._db().execute(
+            'SELECT word, hint FROM word_list_words WHERE list_id = ? ORDER BY position',
+            (row[0],),
+        ).fetchall()
+
+    def page(self, family, category, offset=0, limit=MAX_PAGE):
+        """(JSON list of {word, hint}, total) for one page of a list, or None."""
+        row = self._list_row(family, category)
+        words = None
+        if row is None:
+            # Taken once, in case a reload swaps the built-in lists meanwhile
+            words = self.builtin.get(category)
+            if words is None:
+                return None
+            key = ('page', None, category, self.builtin_version, offset, limit)
+        else:
+            key = ('page', family, category, row[1], offset, limit)
+        return self._cached(key, lambda: self._render_page(row, words, offset, limit))
+
+    def _render_page(self, row, words, offset, limit):
+        if row is None:
+            total, rows = len(words), words[offset:offset + limit]
+        else:
+            db = self._db()
+            total = db.execute('SELECT words FROM word_lists WHERE id = ?', (row[0],)).fetchone()[0]
+            rows = db.execute(
+                'SELECT word, hint FROM word_list_words WHERE list_id = ? AND position >= ? '
+                'ORDER BY position LIMIT ?', (row[0], offset, limit),
+            ).fetchall()
+        return json.dumps([{'word': w, 'hint': h} for w, h in rows]), total
+
+    def lists(self, family, offset=0, limit=100):
+        """JSON page of a family's custom lists, with the built-in categories."""
+        key = ('lists', family, self._family_version(family), self.builtin_version, offset, limit)
+        return self._cached(key, lambda: self._render_lists(family, offset, limit))
+
+    def _render_lists(self, family, offset, limit):
+        db = self._db()
+        total = db.execute('SELECT COUNT(*) FROM word_lists WHERE family = ?', (family,)).fetchone()[0]
+        rows = db.execute(
+            'SELECT category, language, words, version, updated FROM word_lists '
+            'WHERE family = ? ORDER BY category LIMIT ? OFFSET ?', (family, limit, offset),
+        ).fetchall()
+        return json.dumps({
+            'family': family,
+            'total': total,
+            'lists': [
+                {'category': c, 'language': lang, 'words': n, 'version': v, 'updated': t}
+                for c, lang, n, v, t in rows
+            ],
+            'builtin': list(self.builtin),
+        })
+
+    def search(self, family, query, offset=0, limit=50):
+        """JSON page of a family's custom words starting with query (case-insensitive)."""
+        prefix = query.casefold()
+        key = ('search', family, self._family_version(family), prefix, offset, limit)
+        return self._cached(key, lambda: self._render_search(family, prefix, offset, limit))
+
+    def _render_search(self, family, prefix, offset, limit):
+        # A range on the index instead of LIKE, which can't use it here
+        bounds = (family, prefix, prefix + '\U0010ffff')
+        where = 'WHERE w.family = ? AND w.word_key >= ? AND w.word_key < ?'
+        db = self._db()
+        total = db.execute(f'SELECT COUNT(*) FROM word_list_words w {where}', bounds).fetchone()[0]
+        rows = db.execute(
+            'SELECT w.word, w.hint, l.category FROM word_list_words w '
+            f'JOIN word_lists l ON l.id = w.list_id {where} '
+            'ORDER BY w.word_key, l.category LIMIT ? OFFSET ?', bounds + (limit, offset),
+        ).fetchall()
+        return json.dumps({
+            'family': family,
+            'query': prefix,
+            'total': total,
+            'results': [{'word': w, 'hint': h, 'category': c} for w, h, c in rows],
+        })
+
+    def set_builtin(self, builtin):
+        """Swap in new built-in lists, e.g. after prompts.py is reloaded."""
+        with self._lock:
+            self.builtin = builtin
+            self.builtin_version += 1
+            # Every family's lists response names the built-in categories
+            self._responses.clear()
+
+    def _forget(self, family):
+        """Drop this process's responses for a family's old versions.
+
+        Other workers never serve them either, since their keys carry the
+        old version; they just age out of the cache there.
+        """
+        with self._lock:
+            for key in [k for k in self._responses if k[1] == family]:
+                del self._responses[key]
+
+    def _cached(self, key, render):
+        with self._lock:
+            value = self._responses.get(key)
+            if value is not None:
+                self._responses.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = render()
+        with self._lock:
+            self._responses[key] = value
+            while len(self._responses) > self.cache_size:
+                self._responses.popitem(last=False)
+        return value
+
+    def stats(self):
+        db = self._db()
+        with self._lock:
+            cached, hits, misses = len(self._responses), self.hits, self.misses
+        return {
+            'families': db.execute('SELECT COUNT(*) FROM word_families').fetchone()[0],
+            'lists': db.execute('SELECT COUNT(*) FROM word_lists').fetchone()[0],
+            'cachedResponses': cached,
+            'hits': hits,
+            'misses': misses,
+        }